@@ -0,0 +1,193 @@
+from typing import Dict, Any, Optional, Callable
+from collections import OrderedDict
+from contextlib import contextmanager
+import fcntl
+import hashlib
+import json
+import os
+import threading
+import time
+import cv2
+import numpy as np
+
+
+class AssetLibrary:
+    """Persistent cache of rendered base assets (character references, setting backgrounds).
+
+    Assets are keyed by kind, name and a spec (appearance, render settings...),
+    so an asset is reused for as long as its description is unchanged. uint8
+    images are stored as PNG, anything else (e.g. latents) as .npy. The least
+    recently used entries are evicted once max_bytes or max_entries is exceeded,
+    and a few decoded assets are kept in memory for back-to-back scenes.
+
+    Several processes (e.g. uvicorn workers) may share one root: index updates
+    re-read index.json under a file lock and merge it before saving, so no
+    process drops entries written by another. Hits refresh last_used in
+    index.json at most every usage_flush_seconds, so eviction after a restart,
+    or by another process, still follows use rather than creation time.
+    """
+
+    KEY_LOCK_STRIPES = 64
+
+    def __init__(self, root: str = "storage/assets", max_bytes: Optional[int] = None, max_entries: int = 2000, memory_entries: int = 8, usage_flush_seconds: float = 30.0):
+        self.root = root
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("ASSET_CACHE_MAX_MB", "2048")) * 1024 * 1024
+        self.max_entries = max_entries
+        self.memory_entries = memory_entries
+        self.usage_flush_seconds = usage_flush_seconds
+        self.index_path = os.path.join(self.root, "index.json")
+        self.stats = {"hits": 0, "misses": 0, "evictions": 0}
+
+        self._lock = threading.Lock()
+        # Fixed stripes rather than one lock per key ever seen
+        self._key_locks = [threading.Lock() for _ in range(self.KEY_LOCK_STRIPES)]
+        self._memory: "OrderedDict[str, np.ndarray]" = OrderedDict()
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._saved_at = time.monotonic()
+
+        os.makedirs(self.root, exist_ok=True)
+        self._load_index()
+
+    def _load_index(self):
+        self._index = self._read_index()
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        index = {}
+        if os.path.exists(self.index_path):
+            try:
+                with open(self.index_path, 'r') as f:
+                    index = json.load(f)
+            except Exception as e:
+                print(f"Error loading asset index: {e}")
+        # Drop entries whose files were removed behind our back
+        return {key: entry for key, entry in index.items() if os.path.exists(entry["path"])}
+
+    @contextmanager
+    def _index_file_lock(self):
+        with open(self.index_path + ".lock", 'a') as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _merge_index(self):
+        """Fold in entries other processes saved; caller holds both locks"""
+        for key, entry in self._read_index().items():
+            mine = self._index.get(key)
+            if mine is None or entry["last_used"] > mine["last_used"]:
+                self._index[key] = entry
+        # Another process may have evicted some of ours
+        self._index = {key: entry for key, entry in self._index.items() if os.path.exists(entry["path"])}
+        for key in [key for key in self._memory if key not in self._index]:
+            del self._memory[key]
+
+    def _save_index(self):
+        with open(self.index_path + ".tmp", 'w') as f:
+            json.dump(self._index, f, indent=2)
+        os.replace(self.index_path + ".tmp", self.index_path)
+        self._saved_at = time.monotonic()
+
+    def _record_hit(self):
+        """Count a hit and, throttled, persist last_used; caller holds the lock"""
+        self.stats["hits"] += 1
+        if time.monotonic() - self._saved_at >= self.usage_flush_seconds:
+            with self._index_file_lock():
+                self._merge_index()
+                self._save_index()
+
+    @staticmethod
+    def key(kind: str, name: str, spec: Any = None) -> str:
+        payload = json.dumps([kind, name.strip().lower(), spec], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()[:32]
+
+    def get_or_create(self, kind: str, name: str, spec: Any, render: Callable[[], np.ndarray]) -> np.ndarray:
+        """Return the cached asset, rendering and storing it on first use"""
+        key = self.key(kind, name, spec)
+        # Per-key lock so concurrent scenes sharing a setting render it only once
+        with self._key_locks[int(key[:8], 16) % len(self._key_locks)]:
+            asset = self._get(key)
+            if asset is not None:
+                return asset
+
+            self.stats["misses"] += 1
+            asset = render()
+            self._put(key, kind, name, asset)
+            return asset
+
+    def _get(self, key: str) -> Optional[np.ndarray]:
+        with self._lock:
+            entry = self._index.get(key)
+            if entry is None:
+                return None
+            entry["last_used"] = time.time()
+            if key in self._memory:
+                self._memory.move_to_end(key)
+                self._record_hit()
+                return self._memory[key]
+
+        try:
+            asset = np.load(entry["path"]) if entry["path"].endswith(".npy") else cv2.imread(entry["path"], cv2.IMREAD_UNCHANGED)
+        except (OSError, ValueError):
+            asset = None
+        with self._lock:
+            if asset is None:
+                self._index.pop(key, None)
+                return None
+            self._record_hit()
+        self._remember(key, asset)
+        return asset
+
+    def _put(self, key: str, kind: str, name: str, asset: np.ndarray):
+        directory = os.path.join(self.root, kind)
+        os.makedirs(directory, exist_ok=True)
+        if asset.dtype == np.uint8:
+            path = os.path.join(directory, f"{key}.png")
+            cv2.imwrite(path, asset)
+        else:
+            path = os.path.join(directory, f"{key}.npy")
+            np.save(path, asset)
+
+        with self._lock, self._index_file_lock():
+            self._index[key] = {
+                "kind": kind,
+                "name": name,
+                "path": path,
+                "size": os.path.getsize(path),
+                "last_used": time.time()
+            }
+            self._merge_index()
+            self._evict()
+            self._save_index()
+        self._remember(key, asset)
+
+    def _remember(self, key: str, asset: np.ndarray):
+        with self._lock:
+            self._memory[key] = asset
+            self._memory.move_to_end(key)
+            while len(self._memory) > self.memory_entries:
+                self._memory.popitem(last=False)
+
+    def _evict(self):
+        """Drop least recently used assets until within limits; caller holds both locks"""
+        total = sum(entry["size"] for entry in self._index.values())
+        for key in sorted(self._index, key=lambda k: self._index[k]["last_used"]):
+            if total <= self.max_bytes and len(self._index) <= self.max_entries:
+                break
+            entry = self._index.pop(key)
+            total -= entry["size"]
+            self._memory.pop(key, None)
+            try:
+                os.remove(entry["path"])
+            except OSError:
+                pass
+            self.stats["evictions"] += 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                **self.stats,
+                "entries": len(self._index),
+                "bytes": sum(entry["size"] for entry in self._index.values()),
+                "max_bytes": self.max_bytes
+            }
@@ -0,0 +1,239 @@
+from typing import Dict, Any, Optional, Callable, Awaitable, TypeVar
+import asyncio
+import json
+import random
+import time
+
+from openai import (
+    APIConnectionError,
+    APIStatusError,
+    APITimeoutError,
+    RateLimitError,
+)
+
+T = TypeVar("T")
+
+
+class LLMUnavailableError(Exception):
+    """Raised when the LLM could not produce a result within the retry budget"""
+
+
+class CircuitOpenError(LLMUnavailableError):
+    """Raised without calling upstream while the circuit breaker is open"""
+
+
+class CircuitBreaker:
+    """Consecutive-failure circuit breaker.
+
+    closed -> open after failure_threshold retryable failures in a row;
+    open -> half_open once reset_timeout has elapsed, letting a limited number
+    of trial calls through; a trial success closes it, a trial failure reopens it.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, half_open_max_calls: int = 1):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self._state = "closed"
+        self._failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == "open" and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = "half_open"
+            self._half_open_calls = 0
+        return self._state
+
+    def allow_request(self) -> bool:
+        state = self.state
+        if state == "closed":
+            return True
+        if state == "half_open" and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        return False
+
+    def retry_after(self) -> float:
+        """Seconds until an open breaker lets a trial call through"""
+        if self.state != "open":
+            return 0.0
+        return max(0.0, self.reset_timeout - (time.monotonic() - self._opened_at))
+
+    def release_trial(self):
+        """Give back a half-open slot whose call ended without a success or failure verdict"""
+        if self._state == "half_open" and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self):
+        self._state = "closed"
+        self._failures = 0
+
+    def record_failure(self):
+        if self.state == "half_open":
+            self._open()
+            return
+        self._failures += 1
+        if self._failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self):
+        self._state = "open"
+        self._opened_at = time.monotonic()
+        self._failures = 0
+
+
+def is_retryable(error: BaseException) -> bool:
+    """Timeouts, connection errors, 408/409/429 and 5xx are worth retrying; other 4xx are not"""
+    if isinstance(error, (asyncio.TimeoutError, APITimeoutError, APIConnectionError, RateLimitError)):
+        return True
+    if isinstance(error, APIStatusError):
+        return error.status_code in (408, 409, 429) or error.status_code >= 500
+    # The model occasionally returns malformed JSON; a fresh sample usually fixes it
+    return isinstance(error, json.JSONDecodeError)
+
+
+def _retry_after(error: BaseException) -> Optional[float]:
+    response = getattr(error, "response", None)
+    headers = getattr(response, "headers", None)
+    if not headers:
+        return None
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+class ResilientLLMClient:
+    """Runs an upstream LLM operation with deadline-aware retries, jittered
+    exponential backoff, optional request hedging and a circuit breaker.
+
+    ``call`` takes a zero-argument coroutine factory so every attempt (and every
+    hedge) issues a fresh request.
+    """
+
+    def __init__(
+        self,
+        deadline: float = 90.0,
+        attempt_timeout: float = 60.0,
+        max_attempts: int = 4,
+        base_delay: float = 0.5,
+        max_delay: float = 8.0,
+        hedge_after: Optional[float] = None,
+        breaker: Optional[CircuitBreaker] = None
+    ):
+        self.deadline = deadline
+        self.attempt_timeout = attempt_timeout
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self.stats = {
+            "calls": 0,
+            "successes": 0,
+            "failures": 0,
+            "attempts": 0,
+            "retries": 0,
+            "hedges": 0,
+            "hedge_wins": 0,
+            "short_circuited": 0,
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {**self.stats, "circuit_state": self.breaker.state}
+
+    def _backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2**attempt)]"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def call(self, operation: Callable[[], Awaitable[T]]) -> T:
+        self.stats["calls"] += 1
+        deadline_at = time.monotonic() + self.deadline
+        last_error: Optional[BaseException] = None
+
+        for attempt in range(self.max_attempts):
+            remaining = deadline_at - time.monotonic()
+            if remaining <= 0:
+                break
+
+            is_trial = self.breaker.state == "half_open"
+            if not self.breaker.allow_request():
+                self.stats["short_circuited"] += 1
+                self.stats["failures"] += 1
+                raise CircuitOpenError("LLM circuit breaker is open") from last_error
+
+            self.stats["attempts"] += 1
+            recorded = False
+            try:
+                result = await self._attempt(operation, min(self.attempt_timeout, remaining))
+            except Exception as e:
+                last_error = e
+                if not is_retryable(e):
+                    self.stats["failures"] += 1
+                    raise
+                # Malformed model output is worth a fresh sample but says
+                # nothing about upstream health, so it must not open the circuit
+                if not isinstance(e, json.JSONDecodeError):
+                    self.breaker.record_failure()
+                    recorded = True
+                print(f"LLM attempt {attempt + 1}/{self.max_attempts} failed: {type(e).__name__}: {e}")
+            else:
+                self.breaker.record_success()
+                recorded = True
+                self.stats["successes"] += 1
+                return result
+            finally:
+                # Non-retryable errors and cancellation say nothing about upstream
+                # health, but must not keep holding the only half-open slot
+                if is_trial and not recorded:
+                    self.breaker.release_trial()
+
+            if attempt + 1 >= self.max_attempts:
+                break
+            delay = self._backoff(attempt)
+            retry_after = _retry_after(last_error)
+            if retry_after is not None:
+                delay = max(delay, min(retry_after, self.max_delay))
+            if time.monotonic() + delay >= deadline_at:
+                break
+            self.stats["retries"] += 1
+            await asyncio.sleep(delay)
+
+        self.stats["failures"] += 1
+        raise LLMUnavailableError(f"LLM call failed after retries: {last_error}") from last_error
+
+    async def _attempt(self, operation: Callable[[], Awaitable[T]], timeout: float) -> T:
+        """One logical attempt, optionally hedged with a second request after hedge_after seconds"""
+        if self.hedge_after is None or self.hedge_after >= timeout:
+            return await asyncio.wait_for(operation(), timeout)
+
+        started = time.monotonic()
+        primary = asyncio.ensure_future(operation())
+        tasks = {primary}
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=self.hedge_after)
+            if not done and self.breaker.state == "closed":
+                self.stats["hedges"] += 1
+                tasks.add(asyncio.ensure_future(operation()))
+
+            error: Optional[BaseException] = None
+            while tasks:
+                remaining = timeout - (time.monotonic() - started)
+                if remaining <= 0:
+                    break
+                done, tasks = await asyncio.wait(tasks, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is not primary:
+                            self.stats["hedge_wins"] += 1
+                        return task.result()
+                    error = task.exception()
+            if error is not None and not tasks:
+                raise error
+            raise asyncio.TimeoutError()
+        finally:
+            for task in (primary, *tasks):
+                if not task.done():
+                    task.cancel()
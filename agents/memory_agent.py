@@ -1,12 +1,23 @@
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Tuple
+from bisect import bisect_left, bisect_right, insort
 import json
 import os
+import re
 
 class MemoryAgent:
     def __init__(self):
         self.stories_history = {}
         self.current_id = 0
         self.storage_path = "storage/stories.json"
+
+        # Secondary indexes, kept in sync by _index_story
+        self._ids_in_order: List[int] = []
+        self._episode_index: List[Tuple[int, int]] = []  # sorted (episode_number, id)
+        self._character_index: Dict[str, Set[int]] = {}
+        self._setting_index: Dict[str, Set[int]] = {}
+        self._title_trigrams: Dict[str, Set[int]] = {}
+        self._titles: Dict[int, str] = {}
+
         self._load_stories()
         
         # Create storage directory if it doesn't exist
@@ -34,6 +45,80 @@ class MemoryAgent:
                     self.stories_history = {}
                     self.current_id = 0
 
+        self._rebuild_indexes()
+
+    def _rebuild_indexes(self):
+        """Rebuild all secondary indexes from stories_history"""
+        self._ids_in_order = []
+        self._episode_index = []
+        self._character_index = {}
+        self._setting_index = {}
+        self._title_trigrams = {}
+        self._titles = {}
+        for key in sorted(self.stories_history, key=int):
+            self._index_story(int(key), self.stories_history[key])
+
+    def _index_story(self, story_id: int, story: Dict[str, Any]):
+        """Add a single story to the secondary indexes"""
+        self._ids_in_order.append(story_id)
+        insort(self._episode_index, (int(story.get('episode_number') or 0), story_id))
+
+        for name in self._character_names(story):
+            self._character_index.setdefault(name, set()).add(story_id)
+
+        for scene in story.get('scene_breakdown') or []:
+            for token in self._tokenize(scene.get('setting', '')):
+                self._setting_index.setdefault(token, set()).add(story_id)
+
+        title = str(story.get('title', '')).lower()
+        self._titles[story_id] = title
+        for trigram in self._trigrams(title):
+            self._title_trigrams.setdefault(trigram, set()).add(story_id)
+
+    @staticmethod
+    def _tokenize(text: str) -> List[str]:
+        return re.findall(r"[a-z0-9]+", str(text).lower())
+
+    @staticmethod
+    def _trigrams(text: str) -> Set[str]:
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    @staticmethod
+    def _character_names(story: Dict[str, Any]) -> Set[str]:
+        """Collect lowercased character names, plus their first word ("Leo the Brave" -> "leo")"""
+        names = []
+        main_character = story.get('main_character')
+        if isinstance(main_character, dict):
+            names.append(main_character.get('name', ''))
+        for character in story.get('supporting_characters') or []:
+            if isinstance(character, dict):
+                names.append(character.get('name', ''))
+        for scene in story.get('scene_breakdown') or []:
+            names.extend(scene.get('characters_present') or [])
+
+        keys = set()
+        for name in names:
+            name = str(name).strip().lower()
+            if name:
+                keys.add(name)
+                keys.add(name.split()[0])
+        return keys
+
+    def _title_matches(self, query: str) -> Set[int]:
+        """Ids whose title contains query (case-insensitive), using the trigram index"""
+        query = query.lower()
+        trigrams = self._trigrams(query)
+        if not trigrams:
+            return {story_id for story_id, title in self._titles.items() if query in title}
+
+        candidates = None
+        for trigram in trigrams:
+            ids = self._title_trigrams.get(trigram, set())
+            candidates = ids.copy() if candidates is None else candidates & ids
+            if not candidates:
+                return set()
+        return {story_id for story_id in candidates if query in self._titles[story_id]}
+
     def _save_stories(self):
         """Save stories to storage"""
         os.makedirs(os.path.dirname(self.storage_path), exist_ok=True)
@@ -48,13 +133,86 @@ class MemoryAgent:
         self.current_id += 1
         story['id'] = self.current_id
         self.stories_history[str(self.current_id)] = story
+        self._index_story(self.current_id, story)
         self._save_stories()
         return self.current_id
 
     async def get_previous_stories(self, limit: int = 5) -> List[Dict[str, Any]]:
         """Get previous stories up to limit"""
-        stories = list(self.stories_history.values())
-        return stories[-limit:] if stories else []
+        if limit <= 0:
+            return []
+        return [self.stories_history[str(story_id)] for story_id in self._ids_in_order[-limit:]]
+
+    async def search_stories(
+        self,
+        start_episode: Optional[int] = None,
+        end_episode: Optional[int] = None,
+        character: Optional[str] = None,
+        setting: Optional[str] = None,
+        title: Optional[str] = None,
+        fields: Optional[List[str]] = None,
+        offset: int = 0,
+        limit: int = 20
+    ) -> Dict[str, Any]:
+        """List stories ordered by episode, filtered through the secondary indexes.
+
+        The episode range is inclusive; character, setting and title filters are
+        combined with AND. When fields is given, only those top-level keys (plus
+        id) are returned for each story.
+        """
+        lo = bisect_left(self._episode_index, (start_episode, -1)) if start_episode is not None else 0
+        hi = bisect_right(self._episode_index, (end_episode, float('inf'))) if end_episode is not None else len(self._episode_index)
+        # An inverted range (start after end) matches nothing
+        hi = max(hi, lo)
+
+        candidates: Optional[Set[int]] = None
+        filters = []
+        if character:
+            filters.append(self._character_index.get(character.strip().lower(), set()))
+        if setting:
+            tokens = self._tokenize(setting)
+            filters.extend(self._setting_index.get(token, set()) for token in tokens)
+            if not tokens:
+                filters.append(set())
+        if title:
+            filters.append(self._title_matches(title))
+        for ids in sorted(filters, key=len):
+            candidates = ids.copy() if candidates is None else candidates & ids
+            if not candidates:
+                break
+
+        if candidates is None:
+            total = hi - lo
+            page = [story_id for _, story_id in self._episode_index[lo + offset:min(hi, lo + offset + limit)]]
+        elif len(candidates) < hi - lo:
+            # Filters are selective: sort the few matches instead of walking the range
+            episode_of = {story_id: int(self.stories_history[str(story_id)].get('episode_number') or 0) for story_id in candidates}
+            matches = sorted(
+                (episode, story_id) for story_id, episode in episode_of.items()
+                if (start_episode is None or episode >= start_episode)
+                and (end_episode is None or episode <= end_episode)
+            )
+            total = len(matches)
+            page = [story_id for _, story_id in matches[offset:offset + limit]]
+        else:
+            matches = [story_id for _, story_id in self._episode_index[lo:hi] if story_id in candidates]
+            total = len(matches)
+            page = matches[offset:offset + limit]
+
+        items = []
+        for story_id in page:
+            story = self.stories_history[str(story_id)]
+            if fields:
+                story = {key: story[key] for key in fields if key in story}
+                story['id'] = story_id
+            items.append(story)
+
+        return {
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "items": items
+        }
 
     async def get_story(self, story_id: int) -> Dict[str, Any]:
         """Get story by ID"""
@@ -0,0 +1,327 @@
+from typing import Dict, Any, List, Optional, Callable, Iterable
+import asyncio
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import time
+
+
+class PipelineNode:
+    def __init__(self, name: str, func: Callable[..., Any], deps: Iterable[str] = (), params: Any = None, version: str = "1", intermediate: bool = False):
+        self.name = name
+        self.func = func
+        self.deps = list(deps)
+        self.params = params
+        self.version = version
+        # Intermediate outputs are deleted once every node consuming them is up to date
+        self.intermediate = intermediate
+
+
+class PipelineExecutor:
+    """Runs a DAG of pipeline nodes, make-style.
+
+    Each node's fingerprint hashes its name, version, params and the
+    fingerprints of its dependencies. A node whose fingerprint matches the
+    manifest entry from a previous run (and whose output file still exists) is
+    skipped and its recorded output reused; the dependencies of an up-to-date
+    node are not needed at all, so dropped intermediates are not rebuilt. File
+    outputs are moved into cache_dir/<key>/ so they survive restarts and never
+    clash between keys. Once cache_dir exceeds max_bytes, the least recently
+    used keys are evicted. Independent nodes run concurrently; node functions
+    run in worker threads since the agents do blocking work.
+    """
+
+    def __init__(self, cache_dir: str = "storage/pipeline", max_bytes: Optional[int] = None):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes if max_bytes is not None else int(os.getenv("PIPELINE_CACHE_MAX_MB", "4096")) * 1024 * 1024
+        # key -> [lock, number of runs holding or waiting for it]
+        self._locks: Dict[str, list] = {}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def _manifest_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_manifest(self, key: str) -> Dict[str, Any]:
+        path = self._manifest_path(key)
+        if os.path.exists(path):
+            try:
+                with open(path, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                print(f"Error loading pipeline manifest {path}: {e}")
+        return {}
+
+    def _save_manifest(self, key: str, manifest: Dict[str, Any]):
+        path = self._manifest_path(key)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _order(nodes: Dict[str, PipelineNode], targets: Optional[List[str]]) -> List[str]:
+        """Topologically sorted names of the targets and everything they depend on"""
+        order: List[str] = []
+        state: Dict[str, str] = {}
+
+        def visit(name: str):
+            if name not in nodes:
+                raise ValueError(f"Unknown pipeline node: {name}")
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Pipeline cycle through node: {name}")
+            state[name] = "visiting"
+            for dep in nodes[name].deps:
+                visit(dep)
+            state[name] = "done"
+            order.append(name)
+
+        for name in targets or list(nodes):
+            visit(name)
+        return order
+
+    @staticmethod
+    def _fingerprint(node: PipelineNode, dep_fingerprints: List[str]) -> str:
+        payload = json.dumps([node.name, node.version, node.params, dep_fingerprints], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def _fingerprints(self, nodes: Dict[str, PipelineNode], order: List[str]) -> Dict[str, str]:
+        """Fingerprints for nodes in topological order; they depend only on params and deps"""
+        fingerprints: Dict[str, str] = {}
+        for name in order:
+            node = nodes[name]
+            fingerprints[name] = self._fingerprint(node, [fingerprints[dep] for dep in node.deps])
+        return fingerprints
+
+    @staticmethod
+    def _is_present(output: Any) -> bool:
+        return not isinstance(output, str) or os.path.exists(output)
+
+    def _is_current(self, entry: Optional[Dict[str, Any]], fingerprint: str) -> bool:
+        return bool(entry) and entry.get("fingerprint") == fingerprint and self._is_present(entry.get("output"))
+
+    @staticmethod
+    def _call(func: Callable[..., Any], kwargs: Dict[str, Any]) -> Any:
+        result = func(**kwargs)
+        if inspect.iscoroutine(result):
+            # Runs on this worker thread's own event loop
+            return asyncio.run(result)
+        return result
+
+    def _store(self, key: str, name: str, output: Any) -> Any:
+        """Move a file output into the key's artifact directory"""
+        if not isinstance(output, str):
+            return output
+        if not os.path.isfile(output):
+            raise FileNotFoundError(f"Pipeline node {name} returned a missing output: {output}")
+        artifact_dir = os.path.join(self.cache_dir, key)
+        os.makedirs(artifact_dir, exist_ok=True)
+        dest = os.path.join(artifact_dir, name + os.path.splitext(output)[1])
+        if os.path.abspath(output) != os.path.abspath(dest):
+            shutil.move(output, dest)
+        return dest
+
+    def cached_output(self, key: str, nodes: List[PipelineNode], target: str) -> Optional[Any]:
+        """Output of target if the last run left it up to date, else None; never runs or locks"""
+        by_name = {node.name: node for node in nodes}
+        fingerprints = self._fingerprints(by_name, self._order(by_name, [target]))
+        entry = self._load_manifest(key).get(target)
+        if self._is_current(entry, fingerprints[target]):
+            self._touch(key)
+            return entry["output"]
+        return None
+
+    async def run(self, key: str, nodes: List[PipelineNode], targets: Optional[List[str]] = None) -> Dict[str, Any]:
+        """Bring targets up to date; key namespaces the manifest (e.g. one per story)"""
+        slot = self._locks.setdefault(key, [asyncio.Lock(), 0])
+        slot[1] += 1
+        try:
+            async with slot[0]:
+                result = await self._run(key, {node.name: node for node in nodes}, targets)
+        finally:
+            slot[1] -= 1
+            if slot[1] == 0:
+                del self._locks[key]
+        await asyncio.to_thread(self._evict, key)
+        return result
+
+    async def _run(self, key: str, nodes: Dict[str, PipelineNode], targets: Optional[List[str]]) -> Dict[str, Any]:
+        manifest = self._load_manifest(key)
+        order = self._order(nodes, targets)
+        fingerprints = self._fingerprints(nodes, order)
+        current = {name for name in order if self._is_current(manifest.get(name), fingerprints[name])}
+
+        # Make-style: an up-to-date node's dependencies are not needed
+        needed = set()
+
+        def need(name: str):
+            if name in needed:
+                return
+            needed.add(name)
+            if name not in current:
+                for dep in nodes[name].deps:
+                    need(dep)
+
+        for name in targets or list(nodes):
+            need(name)
+
+        tasks: Dict[str, asyncio.Task] = {}
+        executed: List[str] = []
+        skipped: List[str] = []
+        timings: Dict[str, float] = {}
+
+        async def run_node(name: str) -> Any:
+            if name in current:
+                skipped.append(name)
+                return manifest[name]["output"]
+
+            node = nodes[name]
+            dep_outputs = await asyncio.gather(*(tasks[dep] for dep in node.deps))
+            fingerprint = fingerprints[name]
+
+            started = time.perf_counter()
+            output = await asyncio.to_thread(self._call, node.func, dict(zip(node.deps, dep_outputs)))
+            output = self._store(key, name, output)
+            timings[name] = round(time.perf_counter() - started, 3)
+            executed.append(name)
+
+            manifest[name] = {"fingerprint": fingerprint, "output": output}
+            self._save_manifest(key, manifest)
+            return output
+
+        # Tasks are created in dependency order, so every dep task exists before it is awaited
+        for name in order:
+            if name in needed:
+                tasks[name] = asyncio.create_task(run_node(name))
+
+        try:
+            await asyncio.gather(*tasks.values())
+        finally:
+            for task in tasks.values():
+                if not task.done():
+                    task.cancel()
+
+        self._drop_intermediates(key, nodes, order, manifest, fingerprints)
+        self._touch(key)
+        return {
+            "outputs": {name: task.result() for name, task in tasks.items()},
+            "executed": executed,
+            "skipped": skipped,
+            "timings": timings
+        }
+
+
+    def _drop_intermediates(self, key: str, nodes: Dict[str, PipelineNode], order: List[str], manifest: Dict[str, Any], fingerprints: Dict[str, str]):
+        """Delete intermediate outputs whose consumers are all up to date"""
+        dropped = False
+        for name in order:
+            entry = manifest.get(name)
+            if not nodes[name].intermediate or not entry:
+                continue
+            consumers = [other for other in order if name in nodes[other].deps]
+            if consumers and all(self._is_current(manifest.get(other), fingerprints[other]) for other in consumers):
+                output = manifest.pop(name)["output"]
+                if isinstance(output, str) and os.path.exists(output):
+                    os.remove(output)
+                dropped = True
+        if dropped:
+            self._save_manifest(key, manifest)
+
+    def _touch(self, key: str):
+        """Mark a key as recently used for eviction"""
+        try:
+            os.utime(self._manifest_path(key))
+        except OSError:
+            pass
+
+    def _evict(self, keep: str):
+        """Remove least recently used keys until cache_dir fits max_bytes, skipping keep and keys in use"""
+        keys = []
+        total = 0
+        for filename in os.listdir(self.cache_dir):
+            if not filename.endswith(".json"):
+                continue
+            key = filename[:-len(".json")]
+            artifact_dir = os.path.join(self.cache_dir, key)
+            try:
+                size = os.path.getsize(self._manifest_path(key))
+                if os.path.isdir(artifact_dir):
+                    size += sum(entry.stat().st_size for entry in os.scandir(artifact_dir) if entry.is_file())
+                keys.append((os.path.getmtime(self._manifest_path(key)), key, size))
+            except OSError:
+                # Evicted by another process meanwhile
+                continue
+            total += size
+
+        for _, key, size in sorted(keys):
+            if total <= self.max_bytes:
+                break
+            if key == keep or key in self._locks:
+                continue
+            shutil.rmtree(os.path.join(self.cache_dir, key), ignore_errors=True)
+            try:
+                os.remove(self._manifest_path(key))
+            except OSError:
+                pass
+            total -= size
+            print(f"Evicted pipeline artifacts for {key} ({size / 2**20:.1f}MB)")
+
+
+def build_episode_pipeline(story: Dict[str, Any], sound_generator, video_creator) -> List[PipelineNode]:
+    """Episode graph: scene_N and soundtrack run in parallel; scenes + credits -> encode; encode + soundtrack -> mux"""
+    scenes = story["scene_breakdown"]
+    scene_duration = story["duration_minutes"] * 60 / len(scenes)
+    render_settings = {
+        "mock_mode": video_creator.mock_mode,
+        "resolution": list(video_creator.resolution),
+        "frame_rate": video_creator.frame_rate
+    }
+
+    nodes = [
+        PipelineNode(
+            "soundtrack",
+            lambda: sound_generator.generate_sound(story),
+            params={"story": story, "mock_mode": sound_generator.mock_mode, "audio_format": sound_generator.audio_format}
+        ),
+        PipelineNode(
+            "credits",
+            lambda: video_creator.render_credits(story),
+            params={"moral_message": story.get("moral_message"), **render_settings},
+            intermediate=True
+        )
+    ]
+
+    scene_names = []
+    for index, scene in enumerate(scenes):
+        name = f"scene_{index}"
+        scene_names.append(name)
+        nodes.append(PipelineNode(
+            name,
+            lambda index=index: video_creator.render_scene(story, index, scene_duration),
+            params={
+                "scene": scene,
+                "cast": [story.get("main_character")] + list(story.get("supporting_characters") or []),
+                "duration": scene_duration,
+                "episode_number": story.get("episode_number"),
+                "title": story.get("title"),
+                **render_settings
+            },
+            intermediate=True
+        ))
+
+    nodes.append(PipelineNode(
+        "encode",
+        lambda **clips: video_creator.encode_video(story, [clips[name] for name in scene_names + ["credits"]]),
+        deps=scene_names + ["credits"],
+        params={"title": story.get("title")},
+        intermediate=True
+    ))
+    nodes.append(PipelineNode(
+        "mux",
+        lambda encode, soundtrack: video_creator.mux(story, encode, soundtrack),
+        deps=["encode", "soundtrack"],
+        params={"title": story.get("title")}
+    ))
+    return nodes
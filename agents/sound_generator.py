@@ -1,17 +1,36 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 import os
+import subprocess
 import numpy as np
 from pydub import AudioSegment
 from pydub.generators import Sine
+from imageio_ffmpeg import get_ffmpeg_exe
 import tempfile
 import wave
-import struct
+
+# extension, pydub export format, ffmpeg encoder arguments
+AUDIO_FORMATS = {
+    "opus": (".ogg", "ogg", ["-c:a", "libopus", "-b:a", "48k", "-application", "audio"]),
+    "mp3": (".mp3", "mp3", ["-c:a", "libmp3lame", "-b:a", "96k"]),
+    "wav": (".wav", "wav", None),
+}
 
 class SoundGeneratorAgent:
-    def __init__(self):
+    def __init__(self, audio_format: Optional[str] = None):
         self.temp_dir = tempfile.mkdtemp()
         os.makedirs(self.temp_dir, exist_ok=True)  # Ensure temp directory exists
         self.mock_mode = True
+        self.sample_rate = 44100
+        self.audio_format = (audio_format or os.getenv("AUDIO_FORMAT", "opus")).lower()
+        if self.audio_format not in AUDIO_FORMATS:
+            raise ValueError(f"Unsupported audio format: {self.audio_format}")
+
+    def _output_path(self, story: Dict[str, Any]) -> str:
+        """Unique file per run, so concurrent stories with the same title never share an output"""
+        extension = AUDIO_FORMATS[self.audio_format][0]
+        fd, path = tempfile.mkstemp(prefix="audio_", suffix=extension, dir=self.temp_dir)
+        os.close(fd)
+        return path
 
     async def generate_sound(self, story: Dict[str, Any]) -> str:
         """Generate soundtrack for the story"""
@@ -33,8 +52,9 @@ class SoundGeneratorAgent:
                 soundtrack = soundtrack.overlay(scene_audio)
 
             # Export final audio
-            output_path = os.path.join(self.temp_dir, f"{story['title']}_audio.mp3")
-            soundtrack.export(output_path, format="mp3")
+            output_path = self._output_path(story)
+            _, export_format, encoder_args = AUDIO_FORMATS[self.audio_format]
+            soundtrack.export(output_path, format=export_format, parameters=encoder_args)
             return output_path
 
         except Exception as e:
@@ -42,33 +62,59 @@ class SoundGeneratorAgent:
             return await self.create_mock_sound(story)
 
     async def create_mock_sound(self, story: Dict[str, Any]) -> str:
-        """Create a mock soundtrack using WAV format instead of MP3"""
+        """Create a mock soundtrack, encoding one-second chunks as they are synthesized"""
         try:
             duration_secs = story['duration_minutes'] * 60
-            sample_rate = 44100
-            
-            # Create WAV file
-            output_path = os.path.join(self.temp_dir, f"{story['title']}_audio.wav")
-            
-            with wave.open(output_path, 'w') as wav_file:
-                # Set parameters
-                wav_file.setnchannels(1)  # Mono
-                wav_file.setsampwidth(2)  # 2 bytes per sample
-                wav_file.setframerate(sample_rate)
-                
-                # Generate simple sine wave
-                for i in range(int(duration_secs * sample_rate)):
-                    # Simple sine wave at 440Hz
-                    value = int(32767.0 * np.sin(2.0 * np.pi * 440.0 * i / sample_rate))
-                    data = struct.pack('<h', value)
-                    wav_file.writeframes(data)
-            
+            total_samples = int(duration_secs * self.sample_rate)
+            output_path = self._output_path(story)
+            encoder_args = AUDIO_FORMATS[self.audio_format][2]
+
+            if encoder_args is None:
+                with wave.open(output_path, 'w') as wav_file:
+                    wav_file.setnchannels(1)  # Mono
+                    wav_file.setsampwidth(2)  # 2 bytes per sample
+                    wav_file.setframerate(self.sample_rate)
+                    for chunk in self._sine_chunks(total_samples):
+                        wav_file.writeframes(chunk)
+                return output_path
+
+            # Raw 16-bit mono PCM goes straight into the encoder; nothing uncompressed hits disk.
+            # stderr goes to a file so a chatty ffmpeg can never block on a full pipe.
+            with tempfile.TemporaryFile() as stderr_file:
+                encoder = subprocess.Popen(
+                    [get_ffmpeg_exe(), "-y", "-loglevel", "error",
+                     "-f", "s16le", "-ar", str(self.sample_rate), "-ac", "1", "-i", "pipe:0",
+                     *encoder_args, output_path],
+                    stdin=subprocess.PIPE, stderr=stderr_file
+                )
+                try:
+                    for chunk in self._sine_chunks(total_samples):
+                        encoder.stdin.write(chunk)
+                except BrokenPipeError:
+                    pass  # ffmpeg exited early; its stderr below says why
+                finally:
+                    try:
+                        encoder.stdin.close()
+                    except BrokenPipeError:
+                        pass
+                    encoder.wait()
+                stderr_file.seek(0)
+                stderr = stderr_file.read()
+            if encoder.returncode != 0:
+                raise Exception(f"ffmpeg failed: {stderr.decode(errors='replace').strip()}")
+
             return output_path
 
         except Exception as e:
             print(f"Error creating mock sound: {str(e)}")
             raise Exception(f"Failed to create mock sound: {str(e)}")
 
+    def _sine_chunks(self, total_samples: int, frequency: float = 440.0):
+        """Yield a sine wave as little-endian 16-bit PCM, one second at a time"""
+        for start in range(0, total_samples, self.sample_rate):
+            t = np.arange(start, min(start + self.sample_rate, total_samples)) / self.sample_rate
+            yield (32767.0 * np.sin(2.0 * np.pi * frequency * t)).astype('<i2').tobytes()
+
     def _generate_music_for_moment(self, musical_moment: str) -> AudioSegment:
         """Generate music for a specific moment"""
         # Implementation for real music generation
@@ -1,32 +1,62 @@
 from typing import Dict, Any, Optional
-from openai import OpenAI
+from openai import AsyncOpenAI
 import json
 import os
 from dotenv import load_dotenv
+from agents.llm_client import ResilientLLMClient, CircuitBreaker
 from templates.prompt_template import STORY_PROMPT_TEMPLATE
+from templates.mock_story import build_mock_story
 
 class StoryGeneratorAgent:
-    def __init__(self, api_key: str = None):
+    def __init__(self, api_key: str = None, allow_mock_fallback: Optional[bool] = None):
         # Load API key from .env if not provided
         load_dotenv()
         self.api_key = api_key or os.getenv("OPENAI_API_KEY")
         if not self.api_key:
             raise ValueError("OpenAI API key is required")
-            
-        self.client = OpenAI(api_key=self.api_key)
+
+        attempt_timeout = float(os.getenv("LLM_ATTEMPT_TIMEOUT_SECONDS", "60"))
+        hedge_after = os.getenv("LLM_HEDGE_AFTER_SECONDS")
+
+        # Retries are handled by ResilientLLMClient, so the SDK must not retry on its own.
+        # OPENAI_BASE_URL is honoured by the SDK, which is how tools/openai_stub.py is wired in.
+        self.client = AsyncOpenAI(api_key=self.api_key, timeout=attempt_timeout, max_retries=0)
+        self.llm = ResilientLLMClient(
+            deadline=float(os.getenv("LLM_DEADLINE_SECONDS", "90")),
+            attempt_timeout=attempt_timeout,
+            max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", "4")),
+            hedge_after=float(hedge_after) if hedge_after else None,
+            breaker=CircuitBreaker(
+                failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", "5")),
+                reset_timeout=float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+            )
+        )
         self.mock_mode = False  # Set to False to use real OpenAI API
 
+        # Serving the placeholder episode when the LLM is down must be opted into
+        if allow_mock_fallback is None:
+            allow_mock_fallback = os.getenv("STORY_MOCK_FALLBACK", "false").lower() in ("1", "true", "yes")
+        self.allow_mock_fallback = allow_mock_fallback
+        self.fallback_count = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            **self.llm.snapshot(),
+            "fallbacks": self.fallback_count,
+            "allow_mock_fallback": self.allow_mock_fallback
+        }
+
     async def generate_story(self, episode_number: int, theme: Optional[str] = None, previous_stories: list = None) -> Dict[str, Any]:
         if self.mock_mode:
             return self.generate_mock_story(episode_number, theme)
 
-        try:
-            prompt = STORY_PROMPT_TEMPLATE.format(
-                episode_number=episode_number,
-                theme=theme if theme else "Continue the story from previous episodes",
-                previous_stories=json.dumps(previous_stories if previous_stories else [], indent=2)
-            )
+        prompt = STORY_PROMPT_TEMPLATE.format(
+            episode_number=episode_number,
+            theme=theme if theme else "Continue the story from previous episodes",
+            previous_stories=json.dumps(previous_stories if previous_stories else [], indent=2)
+        )
 
+        async def request_story() -> Dict[str, Any]:
             # Use GPT-4 for more creative and detailed stories
             response = await self.client.chat.completions.create(
                 model="gpt-4-turbo-preview",  # You can change this to "gpt-3.5-turbo" if needed
@@ -36,135 +66,29 @@ class StoryGeneratorAgent:
                     Focus on creating visually stunning moments that can be animated in 3D."""},
                     {"role": "user", "content": prompt}
                 ],
+                response_format={"type": "json_object"},
                 temperature=0.9,
                 max_tokens=4000,
                 presence_penalty=0.6,
                 frequency_penalty=0.3
             )
+            return json.loads(response.choices[0].message.content)
 
-            story = json.loads(response.choices[0].message.content)
-            story["episode_number"] = episode_number
-            return story
-
+        try:
+            story = await self.llm.call(request_story)
         except Exception as e:
             print(f"OpenAI API error: {str(e)}")
-            return self.generate_mock_story(episode_number, theme)
+            if not self.allow_mock_fallback:
+                # Non-retryable errors (bad request, bad API key...) are not an
+                # outage and must not look like one to clients
+                raise
+            self.fallback_count += 1
+            story = self.generate_mock_story(episode_number, theme)
+            story["fallback"] = True
+            return story
+
+        story["episode_number"] = episode_number
+        return story
 
     def generate_mock_story(self, episode_number: int, theme: Optional[str] = None) -> Dict[str, Any]:
-        return {
-            "title": f"The Magic Portal Mystery - Episode {episode_number}",
-            "episode_number": episode_number,
-            "duration_minutes": 12,
-            "main_character": {
-                "name": "Leo the Brave",
-                "type": "hero",
-                "traits": ["curious", "adventurous", "fearless"],
-                "background": "A young explorer who discovered the first magic portal",
-                "catchphrase": "Adventure awaits!",
-                "appearance": {
-                    "style": "Modern 3D animated character",
-                    "features": "Spiky brown hair, bright blue eyes, adventurer's outfit",
-                    "colors": ["navy blue jacket", "tan pants", "golden explorer's badge"],
-                    "animations": ["heroic pose", "determined smile", "acrobatic movements"]
-                }
-            },
-            "supporting_characters": [
-                {
-                    "name": "Mia the Genius",
-                    "type": "inventor",
-                    "role": "Tech expert and gadget creator",
-                    "special_ability": "Creates amazing scientific gadgets",
-                    "appearance": {
-                        "style": "Smart and quirky",
-                        "features": "Purple hair with science goggles, lab coat with glowing circuits",
-                        "colors": ["white lab coat", "purple hair", "glowing blue accents"],
-                        "animations": ["excited gestures", "adjusting goggles", "typing holographic displays"]
-                    }
-                },
-                {
-                    "name": "Ziggy",
-                    "type": "talking_animal",
-                    "role": "Comic relief and memory keeper",
-                    "special_ability": "Perfect memory for important clues",
-                    "appearance": {
-                        "style": "Cute and fluffy",
-                        "features": "Spiky brown hair, bright blue eyes, squirrel-like ears",
-                        "colors": ["tan fur", "golden belt", "navy blue jacket"],
-                        "animations": ["playful grin", "curious tilt", "running squirrel"]
-                    }
-                },
-                {
-                    "name": "Professor Wizzle",
-                    "type": "mentor",
-                    "role": "Wise but forgetful guide",
-                    "special_ability": "Ancient magical knowledge",
-                    "appearance": {
-                        "style": "Old and wise",
-                        "features": "White beard, wizard hat, long robes",
-                        "colors": ["gray robes", "wizard hat", "golden accessories"],
-                        "animations": ["reading upside down", "levitating", "casting magical spells"]
-                    }
-                }
-            ],
-            "story_connectors": {
-                "magical_elements": ["mystical portal", "enchanted compass", "time-bending hourglass"],
-                "special_gadgets": ["portal detector", "anti-gravity boots", "holographic map"]
-            },
-            "plot_summary": f"In Episode {episode_number}, Leo and his friends discover a mysterious new portal leading to a world of floating islands. When King Gloom attempts to steal the portal's power, the team must use Mia's latest invention and Ziggy's perfect memory to solve an ancient puzzle. Professor Wizzle provides cryptic but crucial advice, while RoboMax protects the team from Bloop and Blip's chaotic interference.",
-            "visual_style": {
-                "character_design": "Modern 3D animation with expressive features",
-                "animation_style": "Fluid and dynamic like modern Pixar films",
-                "color_palette": ["magical purple", "adventurous orange", "mystical blue"],
-                "lighting_mood": "Dynamic lighting with magical particle effects"
-            },
-            "scene_breakdown": [
-                {
-                    "description": "Opening scene in Professor Wizzle's library",
-                    "setting": "Magical library with floating books and glowing portals",
-                    "characters_present": ["Leo", "Mia", "Ziggy", "Professor Wizzle"],
-                    "action": "Team discovers ancient map revealing new portal location",
-                    "animation_details": {
-                        "character_movements": {
-                            "Leo": "Climbs floating book stacks athletically",
-                            "Mia": "Uses holographic scanner on ancient texts",
-                            "Ziggy": "Bounces between floating books",
-                            "Professor Wizzle": "Levitates while reading upside down"
-                        },
-                        "camera_work": {
-                            "movements": ["sweeping crane shot", "character close-ups", "dynamic tracking"],
-                            "angles": ["low angle hero shots", "overhead library view", "dutch angles for tension"]
-                        },
-                        "special_effects": {
-                            "magical": ["sparkling book trails", "glowing portal energies", "floating dust particles"],
-                            "tech": ["holographic displays", "scanning beams", "gadget interfaces"]
-                        }
-                    },
-                    "comedy_moments": [
-                        {"moment": "Ziggy gets caught in floating book tornado", "animation": "Spinning squirrel with flying books"},
-                        {"moment": "Professor Wizzle reads book upside down", "animation": "Glasses slowly sliding up forehead"}
-                    ],
-                    "duration_seconds": 180  # 3 minutes for opening scene
-                },
-                {
-                    "description": "Portal discovery scene",
-                    "setting": "Mysterious cave with crystal formations",
-                    "characters_present": ["Leo", "Mia", "RoboMax", "King Gloom"],
-                    "action": "Team activates portal while avoiding King Gloom",
-                    "comedy_moments": [
-                        "King Gloom trips on his cape",
-                        "Bloop and Blip phase through wrong walls"
-                    ],
-                    "camera_movements": "Action-packed tracking shots",
-                    "lighting_setup": "Dynamic crystal reflections",
-                    "special_effects": ["portal energy", "crystal gleams", "magical beams"]
-                }
-            ],
-            "moral_message": "Teamwork and creativity can overcome any obstacle",
-            "musical_moments": [
-                "Magical discovery theme",
-                "Action sequence symphony",
-                "Victory celebration song"
-            ],
-            "next_episode_hook": "As the team celebrates their victory, Flora the Fairy appears with urgent news about a disturbance in the portal network..."
-        }
-    
\ No newline at end of file
+        return build_mock_story(episode_number, theme)
@@ -1,13 +1,58 @@
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Iterator, Callable
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import asyncio
 import os
+import queue
+import subprocess
+import threading
+import time
+import hashlib
+import json
 import cv2
 import numpy as np
 from PIL import Image
-import io
-import requests
 import tempfile
-from diffusers import StableVideoDiffusionPipeline, DiffusionPipeline
+from imageio_ffmpeg import get_ffmpeg_exe
+from diffusers import StableVideoDiffusionPipeline, DiffusionPipeline, AutoPipelineForImage2Image
 import torch
+from agents.asset_library import AssetLibrary
+
+_END_OF_FRAMES = object()
+
+
+def current_rss() -> int:
+    """Current resident set size of this process in bytes"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        # No /proc: fall back to the process-lifetime peak
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class FrameBufferPool:
+    """Fixed set of preallocated frame buffers; acquire blocks until one is released"""
+
+    def __init__(self, count: int, shape: tuple):
+        self._free: queue.Queue = queue.Queue()
+        for _ in range(count):
+            self._free.put(np.empty(shape, dtype=np.uint8))
+        self.buffer_bytes = int(np.prod(shape))
+        self.nbytes = count * self.buffer_bytes
+
+    def acquire(self, stop: threading.Event) -> Optional[np.ndarray]:
+        while not stop.is_set():
+            try:
+                return self._free.get(timeout=0.1)
+            except queue.Empty:
+                continue
+        return None
+
+    def release(self, buffer: np.ndarray):
+        self._free.put(buffer)
+
 
 class VideoCreatorAgent:
     def __init__(self, api_key: str):
@@ -16,6 +61,27 @@ class VideoCreatorAgent:
         self.resolution = (1920, 1080)
         self.temp_dir = tempfile.mkdtemp()
         self.mock_mode = True
+        # Diffusers pipelines are not thread-safe and scenes render on parallel
+        # pipeline threads, so GPU calls are serialized
+        self._gpu_lock = threading.Lock()
+        self.frame_queue_size = 4    # keyframes buffered between generator and encoder
+        self.svd_chunk_frames = 8    # SVD frames generated per call
+        self.render_stats = deque(maxlen=100)
+        # Scene nodes run in parallel, each on a short-lived thread. Renders run on
+        # a few long-lived threads instead: that caps renders in flight, and only
+        # those threads ever allocate frame-sized memory, so malloc's per-thread
+        # arenas do not multiply with the number of scenes
+        self.max_parallel_renders = int(os.getenv("MAX_PARALLEL_RENDERS", "1"))
+        self._render_threads = ThreadPoolExecutor(self.max_parallel_renders, thread_name_prefix="render")
+        self._producer_threads = ThreadPoolExecutor(self.max_parallel_renders, thread_name_prefix="frames")
+        # One pool shared by all renders: buffers are allocated once and reused
+        self._frame_pool = FrameBufferPool(
+            self.max_parallel_renders * (self.frame_queue_size + 2),
+            (self.resolution[1], self.resolution[0], 3)
+        )
+        self.character_size = (320, 400)  # width, height of composited character references
+        self.scene_prompt_strength = 0.45  # how far img2img may move away from the composite
+        self.assets = AssetLibrary()
         
         # Initialize the 3D animation pipelines
         if not self.mock_mode:
@@ -37,50 +103,69 @@ class VideoCreatorAgent:
                 token=self.huggingface_key
             ).to("cuda")
 
-    async def generate_scene_frames(self, scene: Dict[str, Any], num_frames: int = 8) -> List[str]:
-        """Generate animated frames using both SVD and SV3D"""
-        try:
-            if self.mock_mode:
-                return await self.generate_mock_frames(scene, num_frames)
-
-            # Create detailed prompt for the scene
-            prompt = self._create_scene_prompt(scene)
-            
-            # First generate 3D scene using SV3D
-            initial_frame = self.sv3d_pipeline(
-                prompt=prompt,
-                num_inference_steps=50,
+            # Img2img pass that stages each scene's description, action and camera
+            # on the composite before SVD animates it
+            self.img2img_pipeline = AutoPipelineForImage2Image.from_pretrained(
+                "stabilityai/stable-diffusion-xl-base-1.0",
+                torch_dtype=torch.float16,
+                variant="fp16",
+                use_safetensors=True,
+                token=self.huggingface_key
+            ).to("cuda")
+
+    def _frame_painters(self, scene: Dict[str, Any], num_frames: int = 8, cast: Optional[Dict[str, Dict[str, Any]]] = None, mock: bool = False) -> Iterator[Callable[[np.ndarray], None]]:
+        """Yield one painter per keyframe; each draws its frame into a preallocated BGR buffer.
+
+        The real path generates SVD frames in chunks of svd_chunk_frames, each
+        chunk conditioned on the last frame of the previous one, so at most one
+        chunk of generated images is alive at a time.
+        """
+        if mock:
+            yield from self._mock_frame_painters(scene, num_frames, cast)
+            return
+
+        # Start from the cached background and character references instead of
+        # regenerating the whole scene with SV3D, then stage this scene on top
+        base_frame = self._compose_scene_base(scene, cast or {}, mock=False)
+        image = Image.fromarray(cv2.cvtColor(base_frame, cv2.COLOR_BGR2RGB))
+        del base_frame
+        with self._gpu_lock:
+            image = self.img2img_pipeline(
+                prompt=self._create_scene_prompt(scene),
+                image=image,
+                strength=self.scene_prompt_strength,
+                num_inference_steps=30,
                 guidance_scale=7.5
             ).images[0]
 
-            # Then generate video frames using SVD
-            video_frames = self.svd_pipeline(
-                image=initial_frame,
-                num_frames=num_frames,
-                num_inference_steps=50,
-                min_guidance_scale=1.0,
-                motion_bucket_id=127,
-                noise_aug_strength=0.1
-            ).frames[0]
-            
-            # Save frames
-            frame_paths = []
-            for i, frame in enumerate(video_frames):
-                path = os.path.join(self.temp_dir, f"frame_{i}.png")
-                frame.save(path)
-                frame_paths.append(path)
-                
-            return frame_paths
-
-        except Exception as e:
-            print(f"Error generating frames: {str(e)}")
-            return await self.generate_mock_frames(scene, num_frames)
-
-    async def generate_mock_frames(self, scene: Dict[str, Any], num_frames: int = 8) -> List[str]:
-        """Generate mock frames for testing"""
-        frame_paths = []
-        base_frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
-        base_frame[:] = (50, 100, 150)
+        # Then generate video frames using SVD
+        produced = 0
+        while produced < num_frames:
+            count = min(self.svd_chunk_frames, num_frames - produced)
+            with self._gpu_lock:
+                chunk = self.svd_pipeline(
+                    image=image,
+                    num_frames=count,
+                    num_inference_steps=50,
+                    min_guidance_scale=1.0,
+                    motion_bucket_id=127,
+                    noise_aug_strength=0.1
+                ).frames[0]
+            image = chunk[-1]
+            for frame in chunk:
+                yield lambda buffer, frame=frame: self._paint_image(frame, buffer)
+            produced += len(chunk)
+            del chunk
+
+    def _paint_image(self, image, buffer: np.ndarray):
+        """Resize a PIL frame to the output resolution and write it into buffer as BGR"""
+        if image.size != self.resolution:
+            image = image.resize(self.resolution)
+        cv2.cvtColor(np.asarray(image.convert("RGB")), cv2.COLOR_RGB2BGR, dst=buffer)
+
+    def _mock_frame_painters(self, scene: Dict[str, Any], num_frames: int = 8, cast: Optional[Dict[str, Dict[str, Any]]] = None) -> Iterator[Callable[[np.ndarray], None]]:
+        """Mock frames for testing"""
+        base_frame = self._compose_scene_base(scene, cast or {}, mock=True)
 
         # Add scene information
         y_position = 100
@@ -93,151 +178,381 @@ class VideoCreatorAgent:
                        cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
             y_position += 50
 
-        # Save multiple slightly different frames
+        # Multiple slightly different frames
         for i in range(num_frames):
-            frame = base_frame.copy()
-            # Add frame number
-            cv2.putText(frame, f"Frame {i+1}", (100, y_position), 
-                       cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-            
-            path = os.path.join(self.temp_dir, f"frame_{i}.png")
-            cv2.imwrite(path, frame)
-            frame_paths.append(path)
+            def paint(buffer: np.ndarray, i: int = i):
+                np.copyto(buffer, base_frame)
+                # Add frame number
+                cv2.putText(buffer, f"Frame {i+1}", (100, y_position), 
+                           cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
+            yield paint
 
-        return frame_paths
+    def _cast_specs(self, story: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+        """Map full and first names ("leo the brave", "leo") to each character's appearance"""
+        characters = [story.get("main_character")] + list(story.get("supporting_characters") or [])
+        cast = {}
+        for character in characters:
+            if not isinstance(character, dict) or not character.get("name"):
+                continue
+            spec = {"name": character["name"], "appearance": character.get("appearance") or {}}
+            full_name = character["name"].strip().lower()
+            cast.setdefault(full_name.split()[0], spec)
+            cast[full_name] = spec
+        return cast
+
+    def _asset_spec(self, mock: bool, **spec) -> Dict[str, Any]:
+        """Everything besides the name that changes how an asset renders"""
+        return {**spec, "resolution": list(self.resolution), "renderer": "mock" if mock else "sv3d"}
+
+    def _background(self, setting: str, mock: bool) -> np.ndarray:
+        return self.assets.get_or_create(
+            "background", setting,
+            self._asset_spec(mock),
+            lambda: self._render_background(setting, mock)
+        )
+
+    def _character_reference(self, name: str, cast: Dict[str, Dict[str, Any]], mock: bool) -> np.ndarray:
+        """BGRA reference whose alpha channel masks out everything but the character"""
+        key = name.strip().lower()
+        spec = cast.get(key) or cast.get(key.split()[0] if key else key) or {"name": name, "appearance": {}}
+        return self.assets.get_or_create(
+            "character", spec["name"],
+            self._asset_spec(mock, appearance=spec["appearance"], size=list(self.character_size), alpha=True),
+            lambda: self._render_character(spec["name"], spec["appearance"], mock)
+        )
+
+    def _compose_scene_base(self, scene: Dict[str, Any], cast: Dict[str, Dict[str, Any]], mock: bool) -> np.ndarray:
+        """Composite the cached setting background with the masked character references"""
+        frame = self._background(scene['setting'], mock).copy()
+        width, height = self.character_size
+        characters = (scene.get('characters_present') or [])[:self.resolution[0] // width]
+        gap = (self.resolution[0] - width * len(characters)) // (len(characters) + 1) if characters else 0
+        top = self.resolution[1] - height - 60
+        for i, name in enumerate(characters):
+            left = gap + i * (width + gap)
+            reference = self._character_reference(name, cast, mock)
+            alpha = reference[:, :, 3:].astype(np.float32) / 255.0
+            region = frame[top:top + height, left:left + width]
+            region[:] = (reference[:, :, :3] * alpha + region * (1.0 - alpha)).astype(np.uint8)
+        return frame
+
+    @staticmethod
+    def _cut_out(image: np.ndarray) -> np.ndarray:
+        """Add an alpha channel that drops the plain backdrop a reference was rendered on"""
+        border = np.concatenate([image[0], image[-1], image[:, 0], image[:, -1]])
+        backdrop = np.median(border, axis=0)
+        distance = np.abs(image.astype(np.int16) - backdrop.astype(np.int16)).max(axis=2)
+        mask = np.where(distance > 30, 255, 0).astype(np.uint8)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((5, 5), np.uint8))
+        # Soft edge so the character does not look pasted on
+        mask = cv2.GaussianBlur(mask, (5, 5), 0)
+        return np.dstack([image, mask])
+
+    def _render_background(self, setting: str, mock: bool) -> np.ndarray:
+        """Render a setting background once; later scenes reuse it from the asset library"""
+        if not mock:
+            with self._gpu_lock:
+                image = self.sv3d_pipeline(
+                    prompt=self._create_setting_prompt(setting),
+                    num_inference_steps=50,
+                    guidance_scale=7.5
+                ).images[0]
+            return cv2.cvtColor(np.asarray(image.convert("RGB").resize(self.resolution)), cv2.COLOR_RGB2BGR)
+
+        # Vertical gradient tinted per setting
+        seed = int(hashlib.sha256(setting.encode()).hexdigest()[:6], 16)
+        top = np.array([seed & 0xff, (seed >> 8) & 0xff, (seed >> 16) & 0xff], dtype=np.float32) * 0.5
+        bottom = np.array([50, 100, 150], dtype=np.float32)
+        ramp = np.linspace(0.0, 1.0, self.resolution[1], dtype=np.float32)[:, None]
+        column = (top * (1 - ramp) + bottom * ramp).astype(np.uint8)
+        frame = np.ascontiguousarray(np.broadcast_to(column[:, None, :], (self.resolution[1], self.resolution[0], 3)))
+        cv2.putText(frame, setting, (100, self.resolution[1] - 20),
+                   cv2.FONT_HERSHEY_SIMPLEX, 0.8, (220, 220, 220), 1)
+        return frame
+
+    def _render_character(self, name: str, appearance: Dict[str, Any], mock: bool) -> np.ndarray:
+        """Render a BGRA character reference once; later scenes reuse it from the asset library"""
+        width, height = self.character_size
+        if not mock:
+            with self._gpu_lock:
+                image = self.sv3d_pipeline(
+                    prompt=self._create_character_prompt(name, appearance),
+                    num_inference_steps=50,
+                    guidance_scale=7.5
+                ).images[0]
+            return self._cut_out(cv2.cvtColor(np.asarray(image.convert("RGB").resize(self.character_size)), cv2.COLOR_RGB2BGR))
+
+        # Figure tinted by appearance on a transparent backdrop
+        seed = int(hashlib.sha256(json.dumps(appearance, sort_keys=True).encode()).hexdigest()[:6], 16)
+        color = (seed & 0xff, (seed >> 8) & 0xff, (seed >> 16) & 0xff, 255)
+        figure = np.zeros((height, width, 4), dtype=np.uint8)
+        head = max(width // 5, 4)
+        cv2.circle(figure, (width // 2, head + 2), head, color, -1)
+        cv2.ellipse(figure, (width // 2, height * 3 // 5), (width // 3, height * 2 // 5 - head), 0, 0, 360, color, -1)
+        cv2.putText(figure, name, (4, height - 8), cv2.FONT_HERSHEY_SIMPLEX, width / 400, (255, 255, 255, 255), 1)
+        return figure
 
     def _create_scene_prompt(self, scene: Dict[str, Any]) -> str:
-        """Create detailed prompt for 3D animation generation"""
+        """Create the per-scene prompt for the img2img pass over the composite"""
+        details = scene.get('animation_details') or {}
+        camera_work = details.get('camera_work') or {}
+        effects = details.get('special_effects') or scene.get('special_effects') or []
+        if isinstance(effects, dict):
+            effects = [effect for group in effects.values() for effect in group]
+        movements = details.get('character_movements') or {}
+        camera = (camera_work.get('movements') or [scene.get('camera_movements', '')])[0]
+        angle = (camera_work.get('angles') or [''])[0]
         return f"""Create a cinematic 3D animated scene in Pixar/Disney style:
-        Scene: {scene['description']}
-        Setting: {scene['setting']}
-        Characters: {', '.join(scene['characters_present'])}
-        Action: {scene['action']}
-        
+        Scene: {scene.get('description', '')}
+        Setting: {scene.get('setting', '')}
+        Characters: {', '.join(scene.get('characters_present') or [])}
+        Action: {scene.get('action', '')}
+
         Style Requirements:
         - High-quality 3D animation
         - Expressive character animations
         - Dynamic lighting and shadows
         - Rich color palette
         - Cinematic composition
-        
-        Camera: {scene['animation_details']['camera_work']['movements'][0]}
-        Angle: {scene['animation_details']['camera_work']['angles'][0]}
-        
-        Special Effects:
-        - Magical: {', '.join(scene['animation_details']['special_effects']['magical'])}
-        - Tech: {', '.join(scene['animation_details']['special_effects']['tech'])}
-        
+
+        Camera: {camera}
+        Angle: {angle}
+        Lighting: {scene.get('lighting_setup', '')}
+        Special Effects: {', '.join(effects)}
+
         Character Actions:
-        {chr(10).join([f'- {char}: {action}' for char, action in scene['animation_details']['character_movements'].items()])}
+        {chr(10).join(f'- {char}: {action}' for char, action in movements.items())}
         """
 
-    async def download_image(self, url: str) -> str:
-        """Download image from URL and save to temporary file"""
-        response = requests.get(url)
-        if response.status_code == 200:
-            img = Image.open(io.BytesIO(response.content))
-            img = img.resize(self.resolution)
-            temp_path = os.path.join(self.temp_dir, f"frame_{hash(url)}.png")
-            img.save(temp_path)
-            return temp_path
-        raise Exception(f"Failed to download image from {url}")
-
-    async def create_scene(self, scene: Dict[str, Any], duration: float) -> str:
-        """Create a scene using OpenCV"""
-        frames = await self.generate_scene_frames(scene)
-        frame_paths = [await self.download_image(frame) for frame in frames]
-        
+    def _create_setting_prompt(self, setting: str) -> str:
+        """Create prompt for a reusable setting background"""
+        return f"""Create a cinematic 3D animated background in Pixar/Disney style, with no characters:
+        Setting: {setting}
+
+        Style Requirements:
+        - Dynamic lighting and shadows
+        - Rich color palette
+        - Cinematic composition
+        """
+
+    def _create_character_prompt(self, name: str, appearance: Dict[str, Any]) -> str:
+        """Create prompt for a reusable character reference image"""
+        return f"""Create a full-body 3D animated character reference in Pixar/Disney style on a plain background:
+        Character: {name}
+        Style: {appearance.get('style', '')}
+        Features: {appearance.get('features', '')}
+        Colors: {', '.join(appearance.get('colors', []))}
+        """
+
+    def create_scene(self, scene: Dict[str, Any], duration: float, num_frames: int = 8, cast: Optional[Dict[str, Dict[str, Any]]] = None, mock: Optional[bool] = None) -> str:
+        """Create a scene using OpenCV.
+
+        Frames are produced on a worker thread into a fixed pool of buffers and
+        handed to the encoder through a bounded queue, so peak memory does not
+        grow with scene or episode length. At most max_parallel_renders clips are
+        rendered at once. Blocks until the clip is written, so async callers
+        should run it with asyncio.to_thread.
+        """
+        mock = self.mock_mode if mock is None else mock
+        return self._render_threads.submit(self._render_clip, scene, duration, num_frames, cast, mock).result()
+
+    def _render_clip(self, scene: Dict[str, Any], duration: float, num_frames: int, cast: Optional[Dict[str, Dict[str, Any]]], mock: bool) -> str:
+        pool = self._frame_pool
+        frames: queue.Queue = queue.Queue(maxsize=self.frame_queue_size)
+        stop = threading.Event()
+        errors: List[BaseException] = []
+        # Buffers this render holds right now and at most, for per-render accounting
+        held = {"now": 0, "peak": 0}
+        held_lock = threading.Lock()
+
+        def acquire() -> Optional[np.ndarray]:
+            buffer = pool.acquire(stop)
+            if buffer is not None:
+                with held_lock:
+                    held["now"] += 1
+                    held["peak"] = max(held["peak"], held["now"])
+            return buffer
+
+        def release(buffer: np.ndarray):
+            with held_lock:
+                held["now"] -= 1
+            pool.release(buffer)
+
+        def put(item) -> bool:
+            # Blocks while the encoder is behind, unless the render has been abandoned
+            while not stop.is_set():
+                try:
+                    frames.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def produce():
+            try:
+                for paint in self._frame_painters(scene, num_frames, cast, mock):
+                    buffer = acquire()
+                    if buffer is None:
+                        return
+                    try:
+                        paint(buffer)
+                    except BaseException:
+                        release(buffer)
+                        raise
+                    if not put(buffer):
+                        release(buffer)
+                        return
+            except BaseException as e:
+                errors.append(e)
+            finally:
+                put(_END_OF_FRAMES)
+
         # Create video writer
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-        temp_path = os.path.join(self.temp_dir, f"scene_{hash(str(scene))}.mp4")
+        temp_path = self._temp_path("scene_", ".mp4")
         out = cv2.VideoWriter(temp_path, fourcc, self.frame_rate, self.resolution)
-        
-        for frame_path in frame_paths:
-            frame = cv2.imread(frame_path)
-            # Repeat frame to match duration
-            for _ in range(int(duration * self.frame_rate / len(frame_paths))):
-                out.write(frame)
-        
-        out.release()
-        return temp_path
 
-    async def generate_video(self, story: Dict[str, Any]) -> str:
-        """Generate video from story"""
+        # Repeat each keyframe to match duration
+        repeats = max(1, int(duration * self.frame_rate / num_frames))
+        started = time.perf_counter()
+        baseline_rss = peak_rss = current_rss()
+        frames_written = 0
+
+        producer = self._producer_threads.submit(produce)
         try:
-            if self.mock_mode:
-                return await self.create_mock_video(story)
-
-            # Original implementation
-            total_duration = story["duration_minutes"] * 60
-            scene_duration = total_duration / len(story["scene_breakdown"])
-            
-            scene_paths = []
-            for scene in story["scene_breakdown"]:
-                scene_path = await self.create_scene(scene, scene_duration)
-                scene_paths.append(scene_path)
-            
-            output_path = os.path.join(self.temp_dir, f"{story['title']}.mp4")
-            os.rename(scene_paths[0], output_path)
-            return output_path
-            
-        except Exception as e:
-            print(f"Error in generate_video: {str(e)}")
-            # Fall back to mock video
-            return await self.create_mock_video(story)
-
-    async def create_mock_video(self, story: Dict[str, Any]) -> str:
-        """Create a simple test video"""
+            while True:
+                buffer = frames.get()
+                if buffer is _END_OF_FRAMES:
+                    break
+                try:
+                    for _ in range(repeats):
+                        out.write(buffer)
+                finally:
+                    release(buffer)
+                frames_written += repeats
+                peak_rss = max(peak_rss, current_rss())
+        finally:
+            stop.set()
+            producer.result()
+            out.release()
+            # The pool is shared, so frames left behind by an abandoned render go back to it
+            while True:
+                try:
+                    buffer = frames.get_nowait()
+                except queue.Empty:
+                    break
+                if buffer is not _END_OF_FRAMES:
+                    release(buffer)
+
+        if errors:
+            raise errors[0]
+
+        self._record_render(temp_path, frames_written, started, baseline_rss, peak_rss, held["peak"] * pool.buffer_bytes)
+        return temp_path
+
+    def _record_render(self, path: str, frames_written: int, started: float, baseline_rss: int, peak_rss: int, buffer_bytes: int):
+        """Keep timing and memory figures for /render-stats.
+
+        RSS is process-wide, so it is only attributed to a render when renders
+        are serialized (max_parallel_renders == 1); otherwise it is left out.
+        """
+        serialized = self.max_parallel_renders == 1
+        stats = {
+            "path": path,
+            "frames_written": frames_written,
+            "seconds": round(time.perf_counter() - started, 3),
+            "frame_buffer_bytes": buffer_bytes,
+            "process_peak_rss_bytes": peak_rss if serialized else None,
+            "process_rss_growth_bytes": peak_rss - baseline_rss if serialized else None
+        }
+        self.render_stats.append(stats)
+        memory = f"peak RSS {peak_rss / 2**20:.1f}MB (+{(peak_rss - baseline_rss) / 2**20:.1f}MB), " if serialized else ""
+        print(f"Rendered {path}: {frames_written} frames, {memory}frame buffers {buffer_bytes / 2**20:.1f}MB")
+
+    async def render_scene(self, story: Dict[str, Any], scene_index: int, duration: float) -> str:
+        """Render a single scene of the story to its own clip"""
+        scene = story["scene_breakdown"][scene_index]
+        cast = self._cast_specs(story)
+        if not self.mock_mode:
+            try:
+                return await asyncio.to_thread(self.create_scene, scene, duration, cast=cast)
+            except Exception as e:
+                print(f"Error rendering scene {scene_index}: {str(e)}")
+
+        # Mock frames go through the same bounded producer/encoder path (5 seconds per scene)
+        return await asyncio.to_thread(self.create_scene, scene, 5, cast=cast, mock=True)
+
+    def _temp_path(self, prefix: str, suffix: str) -> str:
+        """Unique file in temp_dir, so concurrent runs never write to the same path"""
+        fd, path = tempfile.mkstemp(prefix=prefix, suffix=suffix, dir=self.temp_dir)
+        os.close(fd)
+        return path
+
+    def _write_still_clip(self, paint: Callable[[np.ndarray], None], seconds: float, prefix: str) -> str:
+        """Encode one painted frame held for seconds, on a render thread like scenes"""
+        return self._render_threads.submit(self._encode_still, paint, seconds, prefix).result()
+
+    def _encode_still(self, paint: Callable[[np.ndarray], None], seconds: float, prefix: str) -> str:
+        frame = self._frame_pool.acquire(threading.Event())
         try:
-            output_path = os.path.join(self.temp_dir, f"{story['title']}.mp4")
-            
-            # Create video writer
+            paint(frame)
+            path = self._temp_path(prefix, ".mp4")
             fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-            out = cv2.VideoWriter(output_path, fourcc, self.frame_rate, self.resolution)
-            
-            # Generate multiple scenes
-            for scene in story['scene_breakdown']:
-                # Create scene frame
-                frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
-                frame[:] = (50, 100, 150)
-                
-                # Add scene information
-                y_position = 100
-                for text in [
-                    f"Episode {story.get('episode_number', 0)}: {story.get('title', 'Story')}",
-                    f"Scene: {scene['description']}",
-                    f"Setting: {scene['setting']}",
-                    f"Characters: {', '.join(scene['characters_present'])}",
-                ]:
-                    cv2.putText(frame, text, (100, y_position), 
-                              cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 255, 255), 2)
-                    y_position += 50
-                
-                # Write scene frames (5 seconds per scene)
-                for _ in range(5 * self.frame_rate):
-                    out.write(frame)
-            
-            # Add ending credits
-            credit_frame = np.zeros((self.resolution[1], self.resolution[0], 3), dtype=np.uint8)
+            out = cv2.VideoWriter(path, fourcc, self.frame_rate, self.resolution)
+            started = time.perf_counter()
+            baseline_rss = peak_rss = current_rss()
+            frames_written = int(seconds * self.frame_rate)
+            for _ in range(frames_written):
+                out.write(frame)
+            peak_rss = max(peak_rss, current_rss())
+            out.release()
+        finally:
+            self._frame_pool.release(frame)
+        self._record_render(path, frames_written, started, baseline_rss, peak_rss, self._frame_pool.buffer_bytes)
+        return path
+
+    async def render_credits(self, story: Dict[str, Any]) -> str:
+        """Render the ending credits clip"""
+        def paint(credit_frame: np.ndarray):
             credit_frame[:] = (30, 30, 30)
             cv2.putText(credit_frame, "Moral: " + story['moral_message'],
-                       (100, self.resolution[1]//2), cv2.FONT_HERSHEY_SIMPLEX, 
+                       (100, self.resolution[1]//2), cv2.FONT_HERSHEY_SIMPLEX,
                        1, (255, 255, 255), 2)
-            
-            # Write credits (3 seconds)
-            for _ in range(3 * self.frame_rate):
-                out.write(credit_frame)
-            
-            out.release()
-            return output_path
-            
-        except Exception as e:
-            print(f"Error creating mock video: {str(e)}")
-            raise Exception(f"Failed to create mock video: {str(e)}")
-        finally:
-            # Cleanup
-            for file in os.listdir(self.temp_dir):
-                if file.endswith(('.png', '.jpg', '.mp4')) and file != os.path.basename(output_path):
-                    os.remove(os.path.join(self.temp_dir, file))
-                    
 
+        # Write credits (3 seconds)
+        return self._write_still_clip(paint, 3, "credits_")
+
+    async def encode_video(self, story: Dict[str, Any], clip_paths: List[str]) -> str:
+        """Concatenate rendered clips into the silent episode video"""
+        output_path = self._temp_path("video_", ".mp4")
+        list_path = self._temp_path("clips_", ".txt")
+        with open(list_path, 'w') as f:
+            for path in clip_paths:
+                escaped = os.path.abspath(path).replace("'", "'\\''")
+                f.write(f"file '{escaped}'\n")
+
+        # All clips come from the same VideoWriter settings, so streams can be copied
+        self._run_ffmpeg(["-f", "concat", "-safe", "0", "-i", list_path, "-c", "copy", output_path])
+        os.remove(list_path)
+        return output_path
+
+    async def mux(self, story: Dict[str, Any], video_path: str, sound_path: str) -> str:
+        """Combine the episode video with its soundtrack"""
+        output_path = self._temp_path("episode_", ".mp4")
+        self._run_ffmpeg([
+            "-i", video_path, "-i", sound_path,
+            "-map", "0:v:0", "-map", "1:a:0",
+            "-c:v", "copy", "-c:a", "aac", "-shortest",
+            # moov atom up front so players can start before the download finishes
+            "-movflags", "+faststart",
+            output_path
+        ])
+        return output_path
+
+    def _run_ffmpeg(self, args: List[str]):
+        result = subprocess.run(
+            [get_ffmpeg_exe(), "-y", "-loglevel", "error", *args],
+            capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            raise Exception(f"ffmpeg failed: {result.stderr.strip()}")
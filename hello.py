@@ -1,13 +1,19 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, HTTPException, BackgroundTasks, Query, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
-from typing import Optional
+from typing import Optional, List, Dict, Any, Tuple
+import math
 import os
+import re
+from urllib.parse import quote
 from dotenv import load_dotenv
+from openai import APIError
 from agents.story_generator import StoryGeneratorAgent
 from agents.sound_generator import SoundGeneratorAgent
 from agents.video_creator import VideoCreatorAgent
 from agents.memory_agent import MemoryAgent
+from agents.llm_client import LLMUnavailableError, CircuitOpenError
+from agents.pipeline import PipelineExecutor, build_episode_pipeline
 
 load_dotenv()
 
@@ -18,6 +24,7 @@ story_generator = StoryGeneratorAgent()
 sound_generator = SoundGeneratorAgent()
 video_creator = VideoCreatorAgent(api_key=os.getenv("HUGGINGFACE_API_KEY"))
 memory_agent = MemoryAgent()
+pipeline = PipelineExecutor()
 
 class StoryRequest(BaseModel):
     episode_number: int = Field(..., description="Episode number (1 for first episode, 2 for second, etc.)")
@@ -40,57 +47,223 @@ async def generate_story(request: StoryRequest):
         return {
             "id": story_id,
             "episode_number": request.episode_number,
-            "story": new_story
+            "story": new_story,
+            "fallback": bool(new_story.get("fallback"))
         }
+    except CircuitOpenError as e:
+        print(f"Error: {str(e)}")
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(max(1, math.ceil(story_generator.llm.breaker.retry_after())))}
+        )
+    except LLMUnavailableError as e:
+        print(f"Error: {str(e)}")
+        raise HTTPException(status_code=503, detail=str(e))
+    except APIError as e:
+        # Upstream rejected the request (e.g. 400/401): not retryable, so not a 503
+        print(f"Error: {str(e)}")
+        raise HTTPException(status_code=502, detail=str(e))
     except Exception as e:
         print(f"Error: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate-sound/{story_id}")
-async def generate_sound(story_id: int):
-    try:
-        # Get story
-        story = await memory_agent.get_story(story_id)
-        if not story:
-            raise HTTPException(status_code=404, detail=f"Story with ID {story_id} not found")
+@app.get("/llm-status")
+async def llm_status():
+    """Retry, hedge, circuit breaker and fallback counters for the story LLM"""
+    return story_generator.stats()
 
-        # Generate sound
-        sound_path = await sound_generator.generate_sound(story)
-        
-        return FileResponse(
-            sound_path,
-            media_type="audio/mp3",
-            filename=f"{story['title']}_audio.mp3"
+@app.get("/render-stats")
+async def render_stats():
+    """Frame count, duration and process peak memory of recent renders, plus asset cache usage"""
+    return {
+        "renders": list(video_creator.render_stats),
+        "assets": video_creator.assets.snapshot()
+    }
+
+def _parse_fields(fields: Optional[str]) -> Optional[List[str]]:
+    """Split a comma-separated projection like "title,plot_summary" """
+    if not fields:
+        return None
+    return [field.strip() for field in fields.split(",") if field.strip()]
+
+@app.get("/stories")
+async def list_stories(
+    start_episode: Optional[int] = Query(None, description="First episode number (inclusive)"),
+    end_episode: Optional[int] = Query(None, description="Last episode number (inclusive)"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return, e.g. title,plot_summary"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    return await memory_agent.search_stories(
+        start_episode=start_episode,
+        end_episode=end_episode,
+        fields=_parse_fields(fields),
+        offset=offset,
+        limit=limit
+    )
+
+@app.get("/stories/search")
+async def search_stories(
+    character: Optional[str] = Query(None, description="Character name, e.g. Leo or Professor Wizzle"),
+    setting: Optional[str] = Query(None, description="Words that must appear in a scene setting"),
+    title: Optional[str] = Query(None, description="Case-insensitive title substring"),
+    start_episode: Optional[int] = Query(None, description="First episode number (inclusive)"),
+    end_episode: Optional[int] = Query(None, description="Last episode number (inclusive)"),
+    fields: Optional[str] = Query(None, description="Comma-separated top-level fields to return, e.g. title,plot_summary"),
+    offset: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100)
+):
+    return await memory_agent.search_stories(
+        start_episode=start_episode,
+        end_episode=end_episode,
+        character=character,
+        setting=setting,
+        title=title,
+        fields=_parse_fields(fields),
+        offset=offset,
+        limit=limit
+    )
+
+MEDIA_TYPES = {
+    ".ogg": "audio/ogg",
+    ".mp3": "audio/mpeg",
+    ".wav": "audio/wav",
+    ".mp4": "video/mp4",
+}
+STREAM_CHUNK_SIZE = 64 * 1024
+
+def _parse_range(range_header: Optional[str], file_size: int) -> Optional[Tuple[int, int]]:
+    """Parse a single "bytes=start-end" range into inclusive offsets; None means whole file"""
+    if not range_header or not range_header.startswith("bytes="):
+        return None
+    spec = range_header[len("bytes="):].split(",")[0].strip()
+    match = re.fullmatch(r"(\d*)-(\d*)", spec)
+    if not match or not any(match.groups()):
+        # Malformed ranges are ignored and the whole file is sent (RFC 9110)
+        return None
+    start_text, end_text = match.groups()
+    if start_text:
+        start = int(start_text)
+        if end_text and int(end_text) < start:
+            return None
+        end = int(end_text) if end_text else file_size - 1
+    else:
+        # Suffix range: the last N bytes
+        start = max(0, file_size - int(end_text))
+        end = file_size - 1
+    if start >= file_size:
+        raise HTTPException(
+            status_code=416,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{file_size}"}
         )
+    return start, min(end, file_size - 1)
+
+def _iter_file(path: str, start: int, length: int):
+    with open(path, "rb") as f:
+        f.seek(start)
+        while length > 0:
+            chunk = f.read(min(STREAM_CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+
+def _content_disposition(disposition: str, filename: str) -> str:
+    """Same encoding as Starlette's FileResponse: RFC 5987 for anything not plain ASCII"""
+    quoted = quote(filename)
+    if quoted != filename:
+        return f"{disposition}; filename*=utf-8''{quoted}"
+    return f'{disposition}; filename="{filename}"'
+
+def _media_response(request: Request, path: str, filename: str, disposition: str = "attachment") -> StreamingResponse:
+    """Stream a media file in chunks, honouring HTTP Range requests"""
+    file_size = os.path.getsize(path)
+    extension = os.path.splitext(path)[1]
+    headers = {
+        "Accept-Ranges": "bytes",
+        "Content-Disposition": _content_disposition(disposition, filename + extension)
+    }
+    byte_range = _parse_range(request.headers.get("range"), file_size)
+    if byte_range is None:
+        start, end, status_code = 0, file_size - 1, 200
+    else:
+        start, end = byte_range
+        status_code = 206
+        headers["Content-Range"] = f"bytes {start}-{end}/{file_size}"
+    headers["Content-Length"] = str(end - start + 1)
+
+    return StreamingResponse(
+        _iter_file(path, start, end - start + 1),
+        status_code=status_code,
+        media_type=MEDIA_TYPES.get(extension, "application/octet-stream"),
+        headers=headers
+    )
+
+async def _build_media(story_id: int, target: str, prefer_cached: bool = False) -> Tuple[Dict[str, Any], str]:
+    """Bring a pipeline target up to date for a story and return (story, output path).
 
+    With prefer_cached, an up-to-date output from an earlier run is returned
+    without taking the story's pipeline lock, so seeking players never wait
+    behind a render that is still in progress.
+    """
+    story = await memory_agent.get_story(story_id)
+    if not story:
+        raise HTTPException(status_code=404, detail=f"Story with ID {story_id} not found")
+
+    key = f"story-{story_id}"
+    nodes = build_episode_pipeline(story, sound_generator, video_creator)
+    if prefer_cached:
+        output = pipeline.cached_output(key, nodes, target)
+        if output is not None:
+            return story, output
+
+    # Nodes whose inputs have not changed since the last run are reused
+    run = await pipeline.run(key, nodes, targets=[target])
+    return story, run["outputs"][target]
+
+async def _serve_sound(story_id: int, request: Request, disposition: str, prefer_cached: bool = False) -> StreamingResponse:
+    try:
+        story, sound_path = await _build_media(story_id, "soundtrack", prefer_cached)
+        return _media_response(request, sound_path, f"{story['title']}_audio", disposition)
+
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating sound: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
-@app.post("/generate-video/{story_id}")
-async def generate_video(story_id: int):
+async def _serve_video(story_id: int, request: Request, disposition: str, prefer_cached: bool = False) -> StreamingResponse:
     try:
-        # Get story
-        story = await memory_agent.get_story(story_id)
-        if not story:
-            raise HTTPException(status_code=404, detail=f"Story with ID {story_id} not found")
-
-        # Generate sound first
-        sound_path = await sound_generator.generate_sound(story)
-        
-        # Generate video with sound
-        video_path = await video_creator.generate_video(story, sound_path)
-        
-        return FileResponse(
-            video_path,
-            media_type="video/mp4",
-            filename=f"{story['title']}.mp4"
-        )
+        # Soundtrack and scene rendering run concurrently, then encode and mux
+        story, video_path = await _build_media(story_id, "mux", prefer_cached)
+        return _media_response(request, video_path, story['title'], disposition)
 
+    except HTTPException:
+        raise
     except Exception as e:
         print(f"Error generating video: {str(e)}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/generate-sound/{story_id}")
+async def generate_sound(story_id: int, request: Request):
+    return await _serve_sound(story_id, request, "attachment")
+
+@app.post("/generate-video/{story_id}")
+async def generate_video(story_id: int, request: Request):
+    return await _serve_video(story_id, request, "attachment")
+
+@app.get("/media/{story_id}/audio")
+async def stream_sound(story_id: int, request: Request):
+    """Range-capable audio for players; renders only if no up-to-date output exists"""
+    return await _serve_sound(story_id, request, "inline", prefer_cached=True)
+
+@app.get("/media/{story_id}/video")
+async def stream_video(story_id: int, request: Request):
+    """Range-capable video for players; renders only if no up-to-date output exists"""
+    return await _serve_video(story_id, request, "inline", prefer_cached=True)
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000) 
@@ -0,0 +1,88 @@
+import os
+
+import numpy as np
+
+from agents.asset_library import AssetLibrary
+
+
+def _image(value):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def _library(root, **kwargs):
+    return AssetLibrary(root=str(root), max_bytes=kwargs.pop("max_bytes", 1 << 30), **kwargs)
+
+
+def test_renders_once_then_hits(tmp_path):
+    library = _library(tmp_path)
+    renders = []
+
+    def render():
+        renders.append(1)
+        return _image(10)
+
+    first = library.get_or_create("setting", "Forest", {"style": "toon"}, render)
+    second = library.get_or_create("setting", "forest ", {"style": "toon"}, render)
+    assert renders == [1]
+    assert np.array_equal(first, second)
+    assert library.stats["hits"] == 1
+    assert library.stats["misses"] == 1
+
+
+def test_unreadable_asset_is_not_counted_as_hit(tmp_path):
+    library = _library(tmp_path, memory_entries=0)
+    library.get_or_create("setting", "forest", None, lambda: _image(10))
+    path = next(iter(library._index.values()))["path"]
+    with open(path, "wb") as f:
+        f.write(b"not a png")
+
+    library.get_or_create("setting", "forest", None, lambda: _image(20))
+    assert library.stats["hits"] == 0
+    assert library.stats["misses"] == 2
+
+
+def test_processes_sharing_a_root_keep_each_others_entries(tmp_path):
+    first = _library(tmp_path)
+    second = _library(tmp_path)
+    first.get_or_create("setting", "forest", None, lambda: _image(10))
+    second.get_or_create("setting", "castle", None, lambda: _image(20))
+
+    reloaded = _library(tmp_path)
+    assert reloaded.snapshot()["entries"] == 2
+
+
+def test_eviction_covers_entries_from_other_processes(tmp_path):
+    first = _library(tmp_path, max_entries=2)
+    second = _library(tmp_path, max_entries=2)
+    first.get_or_create("setting", "forest", None, lambda: _image(10))
+    forest_path = next(iter(first._index.values()))["path"]
+    second.get_or_create("setting", "castle", None, lambda: _image(20))
+    second.get_or_create("setting", "beach", None, lambda: _image(30))
+
+    assert not os.path.exists(forest_path)
+    assert _library(tmp_path).snapshot()["entries"] == 2
+
+
+def test_hits_are_persisted_for_eviction_after_restart(tmp_path):
+    library = _library(tmp_path, usage_flush_seconds=0)
+    library.get_or_create("character", "leo", None, lambda: _image(10))
+    library.get_or_create("setting", "forest", None, lambda: _image(20))
+    leo_key = AssetLibrary.key("character", "leo")
+    library._index[leo_key]["last_used"] -= 100
+    library._index[AssetLibrary.key("setting", "forest")]["last_used"] -= 50
+    library._save_index()
+
+    # leo is older but gets reused, so after a restart forest is the one to go
+    library.get_or_create("character", "leo", None, lambda: _image(10))
+    restarted = _library(tmp_path, max_entries=2)
+    restarted.get_or_create("setting", "castle", None, lambda: _image(30))
+    assert leo_key in restarted._index
+    assert AssetLibrary.key("setting", "forest") not in restarted._index
+
+
+def test_hits_are_not_written_more_often_than_the_flush_interval(tmp_path):
+    library = _library(tmp_path, usage_flush_seconds=3600)
+    library.get_or_create("setting", "forest", None, lambda: _image(10))
+    mtime = os.stat(library.index_path).st_mtime_ns
+    library.get_or_create("setting", "forest", None, lambda: _image(10))
+    assert os.stat(library.index_path).st_mtime_ns == mtime
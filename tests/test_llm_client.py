@@ -0,0 +1,294 @@
+import asyncio
+import json
+import time
+
+import httpx
+import pytest
+from openai import BadRequestError, InternalServerError
+
+from agents.llm_client import (
+    CircuitBreaker,
+    CircuitOpenError,
+    LLMUnavailableError,
+    ResilientLLMClient,
+)
+
+
+def _api_error(error_class, status_code):
+    request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+    response = httpx.Response(status_code, request=request)
+    return error_class("injected", response=response, body=None)
+
+
+def _open_breaker(breaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.record_failure()
+    assert breaker.state == "open"
+
+
+def _client(breaker=None, **kwargs):
+    options = {"deadline": 5.0, "attempt_timeout": 1.0, "max_attempts": 3, "base_delay": 0.001, "max_delay": 0.01}
+    options.update(kwargs)
+    return ResilientLLMClient(breaker=breaker or CircuitBreaker(failure_threshold=5, reset_timeout=30), **options)
+
+
+class FakeClock:
+    def __init__(self, monkeypatch):
+        self.now = 1000.0
+        monkeypatch.setattr("agents.llm_client.time.monotonic", lambda: self.now)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=30)
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_success()
+    breaker.record_failure()
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert not breaker.allow_request()
+
+
+def test_breaker_half_open_allows_limited_trials(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10, half_open_max_calls=1)
+    _open_breaker(breaker)
+
+    clock.now += 10
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
+
+
+def test_breaker_trial_success_closes(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    _open_breaker(breaker)
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record_success()
+    assert breaker.state == "closed"
+    assert breaker.allow_request()
+
+
+def test_breaker_trial_failure_reopens(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    _open_breaker(breaker)
+    clock.now += 10
+    assert breaker.allow_request()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    clock.now += 9
+    assert breaker.state == "open"
+    clock.now += 1
+    assert breaker.state == "half_open"
+
+
+def test_non_retryable_trial_releases_half_open_slot(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    client = _client(breaker)
+    _open_breaker(breaker)
+    clock.now += 10
+
+    async def bad_request():
+        raise _api_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(client.call(bad_request))
+    assert breaker.state == "half_open"
+
+    async def ok():
+        return "story"
+
+    assert asyncio.run(client.call(ok)) == "story"
+    assert breaker.state == "closed"
+
+
+def test_cancelled_trial_releases_half_open_slot(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    client = _client(breaker)
+    _open_breaker(breaker)
+    clock.now += 10
+
+    async def scenario():
+        started = asyncio.Event()
+
+        async def hang():
+            started.set()
+            await asyncio.sleep(60)
+
+        task = asyncio.create_task(client.call(hang))
+        await started.wait()
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
+
+
+def test_retries_retryable_errors_until_success():
+    client = _client()
+    calls = []
+
+    async def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise _api_error(InternalServerError, 500)
+        return "story"
+
+    assert asyncio.run(client.call(flaky)) == "story"
+    assert len(calls) == 3
+    assert client.stats["retries"] == 2
+    assert client.breaker.state == "closed"
+
+
+def test_non_retryable_error_is_not_retried():
+    client = _client()
+    calls = []
+
+    async def bad_request():
+        calls.append(1)
+        raise _api_error(BadRequestError, 400)
+
+    with pytest.raises(BadRequestError):
+        asyncio.run(client.call(bad_request))
+    assert len(calls) == 1
+
+
+def test_open_breaker_short_circuits():
+    client = _client(CircuitBreaker(failure_threshold=2, reset_timeout=30), max_attempts=2)
+
+    async def failing():
+        raise _api_error(InternalServerError, 503)
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.call(failing))
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(client.call(failing))
+    assert client.stats["short_circuited"] == 1
+
+
+def test_attempt_timeout_is_retried_within_deadline():
+    client = _client(attempt_timeout=0.05, deadline=0.5, max_attempts=10)
+
+    async def hang():
+        await asyncio.sleep(1)
+
+    started = time.monotonic()
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.call(hang))
+    assert time.monotonic() - started < 1.0
+    assert client.stats["attempts"] >= 2
+
+
+def test_hedge_wins_when_primary_is_slow():
+    client = _client(hedge_after=0.02)
+    delays = [0.5, 0.0]
+
+    async def request():
+        await asyncio.sleep(delays.pop(0))
+        return "story"
+
+    assert asyncio.run(client.call(request)) == "story"
+    assert client.stats["hedges"] == 1
+    assert client.stats["hedge_wins"] == 1
+
+
+def test_no_hedge_when_primary_is_fast():
+    client = _client(hedge_after=0.2)
+
+    async def request():
+        return "story"
+
+    assert asyncio.run(client.call(request)) == "story"
+    assert client.stats["hedges"] == 0
+
+
+def test_hedge_covers_failing_primary():
+    client = _client(hedge_after=0.01, max_attempts=1)
+    outcomes = ["fail", "ok"]
+
+    async def request():
+        outcome = outcomes.pop(0)
+        if outcome == "fail":
+            await asyncio.sleep(0.05)
+            raise _api_error(InternalServerError, 500)
+        await asyncio.sleep(0.1)
+        return "story"
+
+    assert asyncio.run(client.call(request)) == "story"
+    assert client.stats["hedge_wins"] == 1
+    assert client.stats["retries"] == 0
+
+
+def test_hedge_loser_is_cancelled():
+    client = _client(hedge_after=0.01)
+    cancelled = []
+    delays = [0.5, 0.0]
+
+    async def request():
+        try:
+            await asyncio.sleep(delays.pop(0))
+            return "story"
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        result = await client.call(request)
+        await asyncio.sleep(0)
+        return result
+
+    assert asyncio.run(scenario()) == "story"
+    assert cancelled == [1]
+
+
+def test_retry_after_counts_down_to_half_open(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=30)
+    assert breaker.retry_after() == 0
+    _open_breaker(breaker)
+    clock.now += 12
+    assert breaker.retry_after() == 18
+    clock.now += 18
+    assert breaker.retry_after() == 0
+
+
+def test_malformed_output_is_retried_without_opening_breaker():
+    client = _client(CircuitBreaker(failure_threshold=1, reset_timeout=30))
+    calls = []
+
+    async def malformed_then_ok():
+        calls.append(1)
+        if len(calls) < 3:
+            return json.loads("{not json")
+        return "story"
+
+    assert asyncio.run(client.call(malformed_then_ok)) == "story"
+    assert len(calls) == 3
+    assert client.breaker.state == "closed"
+
+
+def test_malformed_trial_releases_half_open_slot(monkeypatch):
+    clock = FakeClock(monkeypatch)
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=10)
+    client = _client(breaker, max_attempts=1)
+    _open_breaker(breaker)
+    clock.now += 10
+
+    async def malformed():
+        return json.loads("{not json")
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(client.call(malformed))
+    assert breaker.state == "half_open"
+    assert breaker.allow_request()
@@ -0,0 +1,104 @@
+import os
+
+import pytest
+
+# hello builds every agent at import time, including the diffusers-backed video creator
+pytest.importorskip("diffusers")
+pytest.importorskip("torch")
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.testclient import TestClient
+
+SIZE = 1000
+
+
+@pytest.fixture(scope="module")
+def hello(tmp_path_factory):
+    # Agents create storage/ relative to the working directory on import
+    cwd = os.getcwd()
+    os.chdir(tmp_path_factory.mktemp("app"))
+    os.environ.setdefault("OPENAI_API_KEY", "test")
+    try:
+        import hello
+    finally:
+        os.chdir(cwd)
+    return hello
+
+
+@pytest.fixture
+def client(hello, tmp_path):
+    path = tmp_path / "episode.mp4"
+    path.write_bytes(bytes(range(256)) * 3 + bytes(SIZE - 768))
+    app = FastAPI()
+
+    @app.get("/media")
+    def media(request: Request):
+        return hello._media_response(request, str(path), "Leo’s “Quest”", "inline")
+
+    return TestClient(app), path.read_bytes()
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-99", (0, 99)),
+    ("bytes=900-", (900, SIZE - 1)),
+    ("bytes=900-5000", (900, SIZE - 1)),
+    ("bytes=-100", (900, SIZE - 1)),
+    ("bytes=-5000", (0, SIZE - 1)),
+    ("bytes= 10-20 , 30-40", (10, 20)),
+])
+def test_parse_range(hello, header, expected):
+    assert hello._parse_range(header, SIZE) == expected
+
+
+@pytest.mark.parametrize("header", [
+    None, "", "items=0-10", "bytes=", "bytes=5", "bytes=-", "bytes=a-b", "bytes=--5", "bytes=20-10", "bytes=+1-5",
+])
+def test_malformed_range_means_whole_file(hello, header):
+    assert hello._parse_range(header, SIZE) is None
+
+
+@pytest.mark.parametrize("header", ["bytes=1000-", "bytes=5000-6000", "bytes=-0"])
+def test_unsatisfiable_range(hello, header):
+    with pytest.raises(HTTPException) as error:
+        hello._parse_range(header, SIZE)
+    assert error.value.status_code == 416
+    assert error.value.headers["Content-Range"] == f"bytes */{SIZE}"
+
+
+def test_content_disposition(hello):
+    assert hello._content_disposition("attachment", "episode.mp4") == 'attachment; filename="episode.mp4"'
+    assert hello._content_disposition("inline", "Leo’s Quest.mp4") == "inline; filename*=utf-8''Leo%E2%80%99s%20Quest.mp4"
+
+
+def test_full_response(client):
+    client, body = client
+    response = client.get("/media")
+    assert response.status_code == 200
+    assert response.content == body
+    assert response.headers["accept-ranges"] == "bytes"
+    assert response.headers["content-type"] == "video/mp4"
+    assert response.headers["content-disposition"].startswith("inline; filename*=utf-8''Leo%E2%80%99s")
+
+
+def test_partial_responses(client):
+    client, body = client
+    response = client.get("/media", headers={"Range": "bytes=100-199"})
+    assert response.status_code == 206
+    assert response.content == body[100:200]
+    assert response.headers["content-range"] == f"bytes 100-199/{SIZE}"
+    assert response.headers["content-length"] == "100"
+
+    response = client.get("/media", headers={"Range": "bytes=-10"})
+    assert response.status_code == 206
+    assert response.content == body[-10:]
+
+
+def test_malformed_and_unsatisfiable_responses(client):
+    client, body = client
+    response = client.get("/media", headers={"Range": "bytes=5"})
+    assert response.status_code == 200
+    assert response.content == body
+
+    response = client.get("/media", headers={"Range": f"bytes={SIZE}-"})
+    assert response.status_code == 416
+    assert response.headers["content-range"] == f"bytes */{SIZE}"
@@ -0,0 +1,101 @@
+import asyncio
+
+import pytest
+
+from agents.memory_agent import MemoryAgent
+
+SETTINGS = ["Enchanted Forest", "Crystal Castle", "Sunny Beach"]
+
+
+def _story(episode):
+    return {
+        "title": f"Adventure {episode}: The Magic Portal" if episode % 2 else f"Adventure {episode}: Lost Treasure",
+        "episode_number": episode,
+        "plot_summary": f"Plot {episode}",
+        "main_character": {"name": "Leo the Brave"},
+        "supporting_characters": [{"name": "Mia"}] if episode % 3 == 0 else [],
+        "scene_breakdown": [{"setting": SETTINGS[episode % 3], "characters_present": ["Leo the Brave"]}],
+    }
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    agent = MemoryAgent()
+    # Added out of episode order so results must come from the episode index
+    for episode in [5, 1, 9, 3, 7, 2, 10, 4, 8, 6]:
+        asyncio.run(agent.add_story(_story(episode)))
+    return agent
+
+
+def _search(agent, **kwargs):
+    return asyncio.run(agent.search_stories(**kwargs))
+
+
+def _episodes(result):
+    return [item["episode_number"] for item in result["items"]]
+
+
+def test_lists_all_stories_by_episode(agent):
+    result = _search(agent)
+    assert result["total"] == 10
+    assert _episodes(result) == list(range(1, 11))
+
+
+def test_episode_range_is_inclusive(agent):
+    result = _search(agent, start_episode=3, end_episode=6)
+    assert result["total"] == 4
+    assert _episodes(result) == [3, 4, 5, 6]
+
+
+def test_inverted_episode_range_is_empty(agent):
+    result = _search(agent, start_episode=8, end_episode=3)
+    assert result["total"] == 0
+    assert result["items"] == []
+    assert _search(agent, start_episode=8, end_episode=3, character="mia")["total"] == 0
+
+
+def test_pagination(agent):
+    result = _search(agent, offset=4, limit=3)
+    assert result["total"] == 10
+    assert _episodes(result) == [5, 6, 7]
+    assert _search(agent, start_episode=2, end_episode=4, offset=5)["items"] == []
+
+
+def test_projection_keeps_id(agent):
+    item = _search(agent, fields=["title"], limit=1)["items"][0]
+    assert set(item) == {"title", "id"}
+    assert item["title"].startswith("Adventure 1")
+
+
+def test_character_filter_matches_full_and_first_name(agent):
+    assert _episodes(_search(agent, character="Mia")) == [3, 6, 9]
+    assert _search(agent, character="leo")["total"] == 10
+    assert _search(agent, character="leo the brave")["total"] == 10
+    assert _search(agent, character="nobody")["total"] == 0
+
+
+def test_setting_filter_matches_all_tokens(agent):
+    assert _episodes(_search(agent, setting="crystal castle")) == [1, 4, 7, 10]
+    assert _search(agent, setting="crystal forest")["total"] == 0
+    assert _search(agent, setting="!!")["total"] == 0
+
+
+def test_title_filter_uses_substring_match(agent):
+    assert _episodes(_search(agent, title="magic PORTAL")) == [1, 3, 5, 7, 9]
+    assert _episodes(_search(agent, title="10")) == [10]
+    assert _search(agent, title="portal treasure")["total"] == 0
+
+
+def test_filters_combine_with_episode_range_and_paging(agent):
+    result = _search(agent, character="mia", title="portal", start_episode=1, end_episode=9)
+    assert _episodes(result) == [3, 9]
+    result = _search(agent, title="adventure", start_episode=2, end_episode=9, offset=1, limit=2)
+    assert result["total"] == 8
+    assert _episodes(result) == [3, 4]
+
+
+def test_indexes_survive_reload(agent):
+    reloaded = MemoryAgent()
+    assert _episodes(_search(reloaded, character="mia", setting="forest")) == [3, 6, 9]
+    assert _search(reloaded, setting="beach")["total"] == 3
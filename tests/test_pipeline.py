@@ -0,0 +1,154 @@
+import asyncio
+import os
+
+import pytest
+
+from agents.pipeline import PipelineExecutor, PipelineNode
+
+
+class Graph:
+    """a, b -> join -> final; every call writes a fresh file and is counted"""
+
+    def __init__(self, tmp_path, intermediate=False):
+        self.tmp_path = tmp_path
+        self.calls = []
+        self.params = {"a": 1, "b": 1, "join": 1, "final": 1}
+        self.intermediate = intermediate
+
+    def _output(self, name, size=10):
+        def run(**deps):
+            self.calls.append(name)
+            path = os.path.join(self.tmp_path, f"{name}-{len(self.calls)}.bin")
+            with open(path, "wb") as f:
+                f.write(b"x" * size)
+            return path
+        return run
+
+    def nodes(self):
+        return [
+            PipelineNode("a", self._output("a"), params=self.params["a"], intermediate=self.intermediate),
+            PipelineNode("b", self._output("b"), params=self.params["b"], intermediate=self.intermediate),
+            PipelineNode("join", self._output("join"), deps=["a", "b"], params=self.params["join"], intermediate=self.intermediate),
+            PipelineNode("final", self._output("final"), deps=["join"], params=self.params["final"]),
+        ]
+
+
+def _run(executor, key, graph, targets=("final",)):
+    return asyncio.run(executor.run(key, graph.nodes(), list(targets)))
+
+
+@pytest.fixture
+def executor(tmp_path):
+    return PipelineExecutor(cache_dir=str(tmp_path / "pipeline"))
+
+
+def test_second_run_skips_everything(executor, tmp_path):
+    graph = Graph(tmp_path)
+    first = _run(executor, "story-1", graph)
+    assert sorted(first["executed"]) == ["a", "b", "final", "join"]
+
+    second = _run(executor, "story-1", graph)
+    assert second["executed"] == []
+    assert second["outputs"]["final"] == first["outputs"]["final"]
+    assert len(graph.calls) == 4
+
+
+def test_outputs_move_into_key_directory(executor, tmp_path):
+    output = _run(executor, "story-1", Graph(tmp_path))["outputs"]["final"]
+    assert output == os.path.join(executor.cache_dir, "story-1", "final.bin")
+    assert os.path.isfile(output)
+
+
+def test_param_change_reruns_node_and_dependents_only(executor, tmp_path):
+    graph = Graph(tmp_path)
+    _run(executor, "story-1", graph)
+    graph.params["b"] = 2
+    result = _run(executor, "story-1", graph)
+    assert sorted(result["executed"]) == ["b", "final", "join"]
+    assert result["skipped"] == ["a"]
+
+
+def test_missing_output_is_rebuilt(executor, tmp_path):
+    graph = Graph(tmp_path)
+    outputs = _run(executor, "story-1", graph)["outputs"]
+    os.remove(outputs["join"])
+    result = _run(executor, "story-1", graph)
+    assert result["executed"] == []
+
+    os.remove(outputs["final"])
+    result = _run(executor, "story-1", graph)
+    assert sorted(result["executed"]) == ["final", "join"]
+
+
+def test_keys_do_not_share_results(executor, tmp_path):
+    graph = Graph(tmp_path)
+    _run(executor, "story-1", graph)
+    result = _run(executor, "story-2", graph)
+    assert len(result["executed"]) == 4
+
+
+def test_missing_output_path_fails_the_run(executor, tmp_path):
+    node = PipelineNode("ghost", lambda: str(tmp_path / "never-written.mp4"))
+    with pytest.raises(FileNotFoundError):
+        asyncio.run(executor.run("story-1", [node]))
+
+
+def test_cached_output(executor, tmp_path):
+    graph = Graph(tmp_path)
+    assert executor.cached_output("story-1", graph.nodes(), "final") is None
+    output = _run(executor, "story-1", graph)["outputs"]["final"]
+    assert executor.cached_output("story-1", graph.nodes(), "final") == output
+    graph.params["a"] = 2
+    assert executor.cached_output("story-1", graph.nodes(), "final") is None
+
+
+def test_intermediates_are_dropped_without_invalidating_target(executor, tmp_path):
+    graph = Graph(tmp_path, intermediate=True)
+    outputs = _run(executor, "story-1", graph)["outputs"]
+    assert os.path.exists(outputs["final"])
+    assert not any(os.path.exists(outputs[name]) for name in ("a", "b", "join"))
+
+    result = _run(executor, "story-1", graph)
+    assert result["executed"] == []
+    assert result["skipped"] == ["final"]
+
+
+def test_least_recently_used_keys_are_evicted(executor, tmp_path):
+    graph = Graph(tmp_path)
+    for age, key in enumerate(("story-1", "story-2", "story-3")):
+        _run(executor, key, graph)
+        os.utime(executor._manifest_path(key), (age, age))
+    key_size = os.path.getsize(executor._manifest_path("story-1")) + 4 * 10
+    # Reading story-1 makes story-2 the least recently used
+    assert executor.cached_output("story-1", graph.nodes(), "final") is not None
+
+    executor.max_bytes = 3 * key_size + key_size // 2
+    _run(executor, "story-4", graph)
+    assert not os.path.exists(executor._manifest_path("story-2"))
+    assert not os.path.exists(os.path.join(executor.cache_dir, "story-2"))
+    for key in ("story-1", "story-3", "story-4"):
+        assert os.path.exists(executor._manifest_path(key))
+
+
+def test_keys_in_use_are_not_evicted(tmp_path):
+    executor = PipelineExecutor(cache_dir=str(tmp_path / "pipeline"), max_bytes=0)
+    graph = Graph(tmp_path)
+    result = _run(executor, "story-1", graph)
+    # The key just built is never evicted before the caller serves it
+    assert os.path.exists(result["outputs"]["final"])
+
+    executor._locks["story-1"] = [asyncio.Lock(), 1]
+    result = _run(executor, "story-2", graph)
+    assert os.path.exists(executor._manifest_path("story-1"))
+    assert os.path.exists(result["outputs"]["final"])
+
+
+def test_locks_are_released_after_runs(executor, tmp_path):
+    graph = Graph(tmp_path)
+
+    async def concurrent():
+        await asyncio.gather(*(executor.run("story-1", graph.nodes(), ["final"]) for _ in range(3)))
+
+    asyncio.run(concurrent())
+    assert executor._locks == {}
+    assert len(graph.calls) == 4
@@ -0,0 +1,43 @@
+import asyncio
+from types import SimpleNamespace
+
+import httpx
+import pytest
+from openai import AuthenticationError, InternalServerError
+
+from agents.llm_client import LLMUnavailableError
+from agents.story_generator import StoryGeneratorAgent
+
+
+def _agent(error_class, status_code, allow_mock_fallback=False):
+    agent = StoryGeneratorAgent(api_key="test", allow_mock_fallback=allow_mock_fallback)
+    agent.llm.max_attempts = 2
+    agent.llm.base_delay = agent.llm.max_delay = 0.001
+
+    async def create(**kwargs):
+        request = httpx.Request("POST", "http://llm.test/v1/chat/completions")
+        raise error_class("injected", response=httpx.Response(status_code, request=request), body=None)
+
+    agent.client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=create)))
+    return agent
+
+
+def test_non_retryable_error_is_not_reported_as_unavailable():
+    agent = _agent(AuthenticationError, 401)
+    with pytest.raises(AuthenticationError):
+        asyncio.run(agent.generate_story(1))
+    assert agent.llm.stats["attempts"] == 1
+
+
+def test_exhausted_retries_are_reported_as_unavailable():
+    agent = _agent(InternalServerError, 500)
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(agent.generate_story(1))
+    assert agent.llm.stats["attempts"] == 2
+
+
+def test_fallback_serves_mock_story():
+    agent = _agent(AuthenticationError, 401, allow_mock_fallback=True)
+    story = asyncio.run(agent.generate_story(3))
+    assert story["fallback"] is True
+    assert agent.fallback_count == 1
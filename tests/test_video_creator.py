@@ -0,0 +1,98 @@
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+pytest.importorskip("diffusers")
+pytest.importorskip("torch")
+
+from agents.video_creator import FrameBufferPool, VideoCreatorAgent
+from templates.mock_story import build_mock_story
+
+
+@pytest.fixture
+def agent(tmp_path, monkeypatch):
+    # The asset cache lives under storage/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    agent = VideoCreatorAgent(api_key=None)
+    agent.resolution = (640, 360)
+    agent.character_size = (80, 100)
+    agent._frame_pool = FrameBufferPool(agent.frame_queue_size + 2, (360, 640, 3))
+    return agent
+
+
+def _free_buffers(agent):
+    return agent._frame_pool._free.qsize()
+
+
+def test_scene_render_returns_buffers_and_records_stats(agent):
+    story = build_mock_story(1)
+    total = _free_buffers(agent)
+    path = agent.create_scene(story["scene_breakdown"][0], 2, cast=agent._cast_specs(story))
+
+    assert os.path.getsize(path) > 0
+    assert _free_buffers(agent) == total
+    stats = agent.render_stats[-1]
+    assert stats["frames_written"] == 48
+    assert 0 < stats["frame_buffer_bytes"] <= agent._frame_pool.nbytes
+    assert stats["process_peak_rss_bytes"] > 0
+
+
+def test_failed_render_returns_buffers(agent, monkeypatch):
+    def painters(*args):
+        yield lambda buffer: buffer.fill(0)
+        raise RuntimeError("painter failed")
+
+    monkeypatch.setattr(agent, "_frame_painters", painters)
+    total = _free_buffers(agent)
+    with pytest.raises(RuntimeError, match="painter failed"):
+        agent.create_scene({}, 2)
+    assert _free_buffers(agent) == total
+
+
+def test_rss_is_omitted_when_renders_overlap(agent):
+    agent.max_parallel_renders = 2
+    story = build_mock_story(1)
+    agent.create_scene(story["scene_breakdown"][0], 1, cast=agent._cast_specs(story))
+    assert agent.render_stats[-1]["process_peak_rss_bytes"] is None
+
+
+def test_credits_go_through_render_stats(agent):
+    path = agent._write_still_clip(lambda frame: frame.fill(30), 1, "credits_")
+    assert os.path.getsize(path) > 0
+    assert agent.render_stats[-1]["frames_written"] == agent.frame_rate
+
+
+def test_real_mode_failure_falls_back_to_mock_assets(agent):
+    calls = []
+
+    def sv3d(**kwargs):
+        calls.append(kwargs)
+        raise RuntimeError("CUDA out of memory")
+
+    agent.mock_mode = False
+    agent.sv3d_pipeline = sv3d
+    story = build_mock_story(1)
+    path = asyncio.run(agent.render_scene(story, 0, 2))
+
+    assert os.path.getsize(path) > 0
+    # Only the real attempt reaches SV3D; the fallback renders and caches mock assets
+    assert len(calls) == 1
+    setting = story["scene_breakdown"][0]["setting"]
+    mock_key = agent.assets.key("background", setting, agent._asset_spec(True))
+    assert mock_key in agent.assets._index
+
+
+def test_characters_are_masked_onto_the_background(agent):
+    story = build_mock_story(1)
+    scene = story["scene_breakdown"][0]
+    background = agent._background(scene["setting"], True)
+    frame = agent._compose_scene_base(scene, agent._cast_specs(story), True)
+
+    width, height = agent.character_size
+    gap = (agent.resolution[0] - width * len(scene["characters_present"])) // (len(scene["characters_present"]) + 1)
+    top = agent.resolution[1] - height - 60
+    # The corners of each reference box show the background, its middle shows the character
+    assert np.array_equal(frame[top, gap], background[top, gap])
+    assert not np.array_equal(frame[top + height // 2, gap + width // 2], background[top + height // 2, gap + width // 2])
@@ -0,0 +1,380 @@
+"""Offline end-to-end load test for the FastAPI service.
+
+Starts tools.openai_stub in-process, launches hello:app under uvicorn in a
+scratch directory (so storage/ and temp files never touch the repo), then
+drives a weighted mix of /generate-story, /generate-sound and /generate-video
+at each concurrency level. Example:
+
+    python -m tools.load_test --concurrency 1,4,16 --requests 40 \\
+        --mix story=0.6,sound=0.2,video=0.2 --llm-latency 2 --workers 2
+
+Every concurrency level gets its own server and scratch directory, and the
+same request plan: endpoints, episode numbers and target stories are all
+drawn from the seed up front, so only completion order varies between
+levels. Sound/video requests only target stories written to stories.json
+before the server starts, so every uvicorn worker knows them. With
+--cache fresh (the default) each of those requests gets a story of its own
+and really renders; --cache warm spreads them over the repo's seed stories,
+so most are pipeline cache hits. Per scenario it reports throughput, p50/p95/p99 latency, error and fallback
+rates, peak RSS of the server process tree and peak disk use of the scratch
+directory. A cheap GET /llm-status probe runs alongside the traffic; if its
+latency climbs with load, a handler is blocking the event loop.
+"""
+from typing import Dict, Any, List, Optional
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+import httpx
+
+from templates.mock_story import build_mock_story
+from tools.openai_stub import OpenAIStub, FaultConfig
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE")
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def process_tree_rss(root_pid: int) -> Optional[int]:
+    """Resident set size in bytes of a process and all its descendants (Linux /proc)"""
+    try:
+        children: Dict[int, List[int]] = {}
+        for entry in os.listdir("/proc"):
+            if not entry.isdigit():
+                continue
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    # ppid is the 2nd field after the parenthesised command name
+                    ppid = int(f.read().rsplit(")", 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                continue
+            children.setdefault(ppid, []).append(int(entry))
+
+        total, stack = 0, [root_pid]
+        while stack:
+            pid = stack.pop()
+            try:
+                with open(f"/proc/{pid}/statm") as f:
+                    total += int(f.read().split()[1]) * PAGE_SIZE
+            except (OSError, IndexError, ValueError):
+                pass
+            stack.extend(children.get(pid, []))
+        return total
+    except OSError:
+        return None
+
+
+def disk_usage(path: str) -> int:
+    total = 0
+    for dirpath, _, filenames in os.walk(path):
+        for name in filenames:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+def load_seed_stories() -> Dict[str, Dict[str, Any]]:
+    """Stories from the repo's storage/stories.json, keyed by id"""
+    path = os.path.join(REPO_ROOT, "storage", "stories.json")
+    if not os.path.exists(path):
+        return {}
+    with open(path) as f:
+        data = json.load(f)
+    if isinstance(data, list):
+        return {str(i): {**story, "id": i} for i, story in enumerate(data, 1)}
+    return data.get("stories", {})
+
+
+def build_plan(requests: int, mix: Dict[str, float], cache: str, seed_stories: Dict[str, Dict[str, Any]], rng: random.Random):
+    """Request sequence for one scenario, plus the stories the server must start with"""
+    endpoints = list(mix)
+    weights = [mix[name] for name in endpoints]
+    seed_ids = sorted(int(story_id) for story_id in seed_stories)
+    stories = dict(seed_stories)
+    next_id = max(seed_ids, default=0)
+    plan = []
+    for _ in range(requests):
+        endpoint = rng.choices(endpoints, weights)[0]
+        if endpoint == "story":
+            plan.append((endpoint, rng.randint(1, 50)))
+        elif cache == "warm" and seed_ids:
+            plan.append((endpoint, rng.choice(seed_ids)))
+        else:
+            # A story nobody has rendered yet, so the request cannot be a cache hit
+            next_id += 1
+            story = build_mock_story(1000 + next_id)
+            story["id"] = next_id
+            stories[str(next_id)] = story
+            plan.append((endpoint, next_id))
+    return plan, stories
+
+
+class ServerProcess:
+    """uvicorn running hello:app against the stub, inside a scratch directory"""
+
+    def __init__(self, llm_base_url: str, stories: Dict[str, Dict[str, Any]], workers: int = 1, port: Optional[int] = None, env: Optional[Dict[str, str]] = None):
+        self.port = port or _free_port()
+        self.base_url = f"http://127.0.0.1:{self.port}"
+        self.scratch_dir = tempfile.mkdtemp(prefix="cartoon-loadtest-")
+        os.makedirs(os.path.join(self.scratch_dir, "storage"))
+        os.makedirs(os.path.join(self.scratch_dir, "tmp"))
+        # Written before start-up so every worker's MemoryAgent loads the same stories
+        with open(os.path.join(self.scratch_dir, "storage", "stories.json"), "w") as f:
+            json.dump({"stories": stories, "current_id": max(map(int, stories), default=0)}, f)
+
+        self.env = {
+            **os.environ,
+            "PYTHONPATH": REPO_ROOT + os.pathsep + os.environ.get("PYTHONPATH", ""),
+            "OPENAI_BASE_URL": llm_base_url,
+            "OPENAI_API_KEY": "stub",
+            "TMPDIR": os.path.join(self.scratch_dir, "tmp"),
+            **(env or {})
+        }
+        self.workers = workers
+        self.process: Optional[subprocess.Popen] = None
+
+    def start(self, timeout: float = 120.0):
+        self.process = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "hello:app", "--host", "127.0.0.1",
+             "--port", str(self.port), "--workers", str(self.workers), "--log-level", "warning"],
+            cwd=self.scratch_dir, env=self.env
+        )
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                raise RuntimeError(f"Server exited with code {self.process.returncode}")
+            try:
+                httpx.get(f"{self.base_url}/llm-status", timeout=1.0)
+                return
+            except httpx.HTTPError:
+                time.sleep(0.25)
+        raise RuntimeError("Server did not become ready in time")
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+        shutil.rmtree(self.scratch_dir, ignore_errors=True)
+
+
+class ResourceSampler:
+    """Samples server RSS and scratch disk use in the background, keeping the peaks"""
+
+    def __init__(self, server: ServerProcess, interval: float = 0.5):
+        self.server = server
+        self.interval = interval
+        self.peak_rss: Optional[int] = None
+        self.peak_disk = 0
+
+    def _sample(self):
+        rss = process_tree_rss(self.server.process.pid)
+        if rss is not None:
+            self.peak_rss = max(self.peak_rss or 0, rss)
+        self.peak_disk = max(self.peak_disk, disk_usage(self.server.scratch_dir))
+
+    async def run(self, stop: asyncio.Event):
+        while not stop.is_set():
+            await asyncio.to_thread(self._sample)
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval)
+            except asyncio.TimeoutError:
+                pass
+
+
+async def _probe(client: httpx.AsyncClient, stop: asyncio.Event, latencies: List[float], interval: float = 0.2):
+    while not stop.is_set():
+        started = time.perf_counter()
+        try:
+            await client.get("/llm-status")
+            latencies.append(time.perf_counter() - started)
+        except httpx.HTTPError:
+            pass
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def run_scenario(server: ServerProcess, concurrency: int, plan: List[tuple], timeout: float) -> Dict[str, Any]:
+    endpoints = sorted({endpoint for endpoint, _ in plan})
+    results: List[Dict[str, Any]] = []
+    probe_latencies: List[float] = []
+    remaining = iter(plan)
+
+    async with httpx.AsyncClient(base_url=server.base_url, timeout=timeout) as client:
+
+        async def worker():
+            for endpoint, arg in remaining:
+                started = time.perf_counter()
+                record = {"endpoint": endpoint, "fallback": False}
+                try:
+                    if endpoint == "story":
+                        response = await client.post("/generate-story", json={"episode_number": arg})
+                        if response.status_code == 200:
+                            record["fallback"] = bool(response.json().get("fallback"))
+                    else:
+                        async with client.stream("POST", f"/generate-{endpoint}/{arg}") as response:
+                            async for _ in response.aiter_bytes():
+                                pass
+                    record["status"] = response.status_code
+                except httpx.HTTPError as e:
+                    record["status"] = type(e).__name__
+                record["latency"] = time.perf_counter() - started
+                results.append(record)
+
+        stop = asyncio.Event()
+        sampler = ResourceSampler(server)
+        background = [
+            asyncio.create_task(sampler.run(stop)),
+            asyncio.create_task(_probe(client, stop, probe_latencies))
+        ]
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await asyncio.gather(*background)
+        llm_status = (await client.get("/llm-status")).json()
+
+    def summarize(records: List[Dict[str, Any]]) -> Dict[str, Any]:
+        latencies = [r["latency"] for r in records]
+        errors = sum(1 for r in records if r["status"] != 200)
+        return {
+            "requests": len(records),
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "error_rate": errors / len(records) if records else 0.0,
+            "fallback_rate": sum(1 for r in records if r["fallback"]) / len(records) if records else 0.0
+        }
+
+    return {
+        "concurrency": concurrency,
+        "elapsed_seconds": elapsed,
+        "throughput_rps": len(results) / elapsed if elapsed else 0.0,
+        **summarize(results),
+        "by_endpoint": {name: summarize([r for r in results if r["endpoint"] == name]) for name in endpoints},
+        "probe_p99": percentile(probe_latencies, 99),
+        "peak_rss_bytes": sampler.peak_rss,
+        "peak_disk_bytes": sampler.peak_disk,
+        "llm_status": llm_status
+    }
+
+
+def _fmt_seconds(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.3f}s"
+
+
+def _fmt_bytes(value: Optional[int]) -> str:
+    return "-" if value is None else f"{value / (1024 * 1024):.1f}MB"
+
+
+def print_report(scenarios: List[Dict[str, Any]]):
+    header = f"{'conc':>5} {'reqs':>5} {'rps':>7} {'p50':>9} {'p95':>9} {'p99':>9} {'err%':>6} {'fb%':>6} {'probe99':>9} {'peakRSS':>9} {'peakDisk':>9}"
+    print(header)
+    print("-" * len(header))
+    for s in scenarios:
+        print(
+            f"{s['concurrency']:>5} {s['requests']:>5} {s['throughput_rps']:>7.2f} "
+            f"{_fmt_seconds(s['p50']):>9} {_fmt_seconds(s['p95']):>9} {_fmt_seconds(s['p99']):>9} "
+            f"{s['error_rate'] * 100:>5.1f}% {s['fallback_rate'] * 100:>5.1f}% "
+            f"{_fmt_seconds(s['probe_p99']):>9} {_fmt_bytes(s['peak_rss_bytes']):>9} {_fmt_bytes(s['peak_disk_bytes']):>9}"
+        )
+        for name, stats in s["by_endpoint"].items():
+            print(
+                f"{'':>5} {stats['requests']:>5} {name:>7} "
+                f"{_fmt_seconds(stats['p50']):>9} {_fmt_seconds(stats['p95']):>9} {_fmt_seconds(stats['p99']):>9} "
+                f"{stats['error_rate'] * 100:>5.1f}% {stats['fallback_rate'] * 100:>5.1f}%"
+            )
+
+
+def parse_mix(value: str) -> Dict[str, float]:
+    mix = {}
+    for part in value.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ("story", "sound", "video"):
+            raise argparse.ArgumentTypeError(f"Unknown endpoint in mix: {name}")
+        mix[name] = float(weight or 1)
+    return mix
+
+
+async def main_async(args: argparse.Namespace) -> List[Dict[str, Any]]:
+    stub = OpenAIStub(faults=FaultConfig(
+        latency=args.llm_latency,
+        jitter=args.llm_jitter,
+        error_rate=args.llm_error_rate
+    ), seed=args.seed).start()
+    env = {"STORY_MOCK_FALLBACK": "true"} if args.allow_fallback else None
+    plan, stories = build_plan(args.requests, args.mix, args.cache, load_seed_stories(), random.Random(args.seed))
+    scenarios = []
+    try:
+        for concurrency in args.concurrency:
+            # Fresh server and scratch dir: a warm cache would make later levels look faster
+            server = ServerProcess(stub.base_url, stories, workers=args.workers, env=env)
+            try:
+                await asyncio.to_thread(server.start)
+                print(f"Running {args.requests} requests at concurrency {concurrency}...", flush=True)
+                scenario = await run_scenario(server, concurrency, plan, args.timeout)
+                scenarios.append({**scenario, "workers": args.workers, "cache": args.cache})
+            finally:
+                server.stop()
+    finally:
+        stub.stop()
+    return scenarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline load test for the cartoon video service")
+    parser.add_argument("--concurrency", type=lambda v: [int(c) for c in v.split(",")], default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=40, help="Requests per scenario")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("story=0.6,sound=0.2,video=0.2"))
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--cache", choices=["fresh", "warm"], default="fresh",
+                        help="fresh: every sound/video request renders a new story; warm: reuse the seed stories")
+    parser.add_argument("--timeout", type=float, default=600.0, help="Per-request client timeout in seconds")
+    parser.add_argument("--llm-latency", type=float, default=1.0)
+    parser.add_argument("--llm-jitter", type=float, default=0.5)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0)
+    parser.add_argument("--allow-fallback", action="store_true", help="Run the server with STORY_MOCK_FALLBACK=true")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_path", default=None, help="Also write the full results to this file")
+    args = parser.parse_args()
+
+    scenarios = asyncio.run(main_async(args))
+    print(f"workers={args.workers} cache={args.cache}")
+    print_report(scenarios)
+    if args.json_path:
+        with open(args.json_path, "w") as f:
+            json.dump(scenarios, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
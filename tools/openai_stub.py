@@ -0,0 +1,193 @@
+"""Local OpenAI chat-completions stand-in with fault injection.
+
+Serves POST /v1/chat/completions with a mock story so the app and the LLM call
+layer can be exercised offline. Point the app at it with
+
+    python -m tools.openai_stub --port 8100 --latency 0.5 --error-rate 0.2
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1 OPENAI_API_KEY=stub uvicorn hello:app
+
+Faults can be changed at runtime with POST /_stub/config (same keys as
+FaultConfig) and counters are available from GET /_stub/stats.
+"""
+from dataclasses import dataclass, asdict, fields
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from typing import Dict, Any, Optional
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+
+from templates.mock_story import build_mock_story
+
+
+@dataclass
+class FaultConfig:
+    latency: float = 0.0          # seconds added to every completion
+    jitter: float = 0.0           # uniform extra latency in [0, jitter]
+    error_rate: float = 0.0       # fraction answered with error_status
+    error_status: int = 500
+    rate_limit_rate: float = 0.0  # fraction answered with 429 + Retry-After
+    hang_rate: float = 0.0        # fraction that stall for hang_seconds before answering
+    hang_seconds: float = 120.0
+    malformed_rate: float = 0.0   # fraction whose message content is not valid JSON
+    drop_rate: float = 0.0        # fraction whose connection is closed without a response
+
+
+class OpenAIStub:
+    """Threaded stub server; usable from the CLI or embedded in tests and load runs"""
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, faults: Optional[FaultConfig] = None, seed: Optional[int] = None):
+        self.faults = faults or FaultConfig()
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "ok": 0, "errors": 0, "rate_limited": 0, "hung": 0, "malformed": 0, "dropped": 0}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "OpenAIStub":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def serve_forever(self):
+        self._server.serve_forever()
+
+    def _count(self, key: str):
+        with self._lock:
+            self.stats[key] += 1
+
+    def _pick_fault(self) -> Optional[str]:
+        """Choose at most one fault for a request according to the configured rates"""
+        roll = self.random.random()
+        for name in ("drop", "error", "rate_limit", "hang", "malformed"):
+            rate = getattr(self.faults, f"{name}_rate")
+            if roll < rate:
+                return name
+            roll -= rate
+        return None
+
+    def completion(self, body: Dict[str, Any], malformed: bool = False) -> Dict[str, Any]:
+        prompt = " ".join(str(m.get("content", "")) for m in body.get("messages", []))
+        match = re.search(r"Episode (\d+)", prompt)
+        story = build_mock_story(int(match.group(1)) if match else 1)
+        content = json.dumps(story)
+        if malformed:
+            content = "Here is your story: " + content[:len(content) // 2]
+        return {
+            "id": f"chatcmpl-{uuid.uuid4().hex[:24]}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "stub"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": content},
+                "finish_reason": "stop"
+            }],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4}
+        }
+
+    def _handler_class(self):
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def _read_json(self) -> Dict[str, Any]:
+                length = int(self.headers.get("Content-Length") or 0)
+                return json.loads(self.rfile.read(length) or b"{}")
+
+            def do_GET(self):
+                if self.path == "/_stub/stats":
+                    with stub._lock:
+                        self._send_json(200, {**stub.stats, "faults": asdict(stub.faults)})
+                else:
+                    self._send_json(404, {"error": {"message": "not found"}})
+
+            def do_POST(self):
+                body = self._read_json()
+                if self.path == "/_stub/config":
+                    known = {f.name for f in fields(FaultConfig)}
+                    for key, value in body.items():
+                        if key in known:
+                            setattr(stub.faults, key, type(getattr(stub.faults, key))(value))
+                    self._send_json(200, asdict(stub.faults))
+                    return
+                if self.path not in ("/v1/chat/completions", "/chat/completions"):
+                    self._send_json(404, {"error": {"message": "not found"}})
+                    return
+
+                stub._count("requests")
+                faults = stub.faults
+                fault = stub._pick_fault()
+                time.sleep(faults.latency + stub.random.uniform(0, faults.jitter))
+
+                if fault == "drop":
+                    stub._count("dropped")
+                    self.close_connection = True
+                    return
+                if fault == "error":
+                    stub._count("errors")
+                    self._send_json(faults.error_status, {"error": {"message": "injected failure", "type": "server_error"}})
+                    return
+                if fault == "rate_limit":
+                    stub._count("rate_limited")
+                    self._send_json(429, {"error": {"message": "injected rate limit", "type": "rate_limit_error"}}, {"Retry-After": "1"})
+                    return
+                if fault == "hang":
+                    stub._count("hung")
+                    time.sleep(faults.hang_seconds)
+                if fault == "malformed":
+                    stub._count("malformed")
+                else:
+                    stub._count("ok")
+                self._send_json(200, stub.completion(body, malformed=fault == "malformed"))
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fault-injecting OpenAI stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--seed", type=int, default=None)
+    for field in fields(FaultConfig):
+        parser.add_argument(f"--{field.name.replace('_', '-')}", type=type(field.default), default=field.default)
+    args = parser.parse_args()
+
+    faults = FaultConfig(**{field.name: getattr(args, field.name) for field in fields(FaultConfig)})
+    stub = OpenAIStub(args.host, args.port, faults, seed=args.seed)
+    print(f"OpenAI stub listening on {stub.base_url} with {faults}")
+    try:
+        stub.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()